@@ -100,6 +100,26 @@ class LPNBlock:
     def add_connecting_wire(self, new_wire):
         self.connecting_wires_list.append(new_wire)
 
+    def reset(self):
+        """
+        Clear the wires and global ids assigned when the block was connected into a 0d model,
+        so that the block can be reused in a new block list; all block matrices and vectors are queued for reassembly
+        """
+        self.connecting_wires_list = []
+        self.LPN_solution_ids = []
+        self.global_col_id = []
+        self.global_row_id = []
+        self.flat_row_ids = []
+        self.flat_col_ids = []
+        self.queue_reassembly()
+
+    def queue_reassembly(self):
+        """
+        Queue all block matrices and vectors for reassembly, e.g. before the block is used in a new time integration
+        """
+        self.mats_to_assemble.update(self.mat)
+        self.vecs_to_assemble.update(self.vec)
+
     def update_time(self, args):
         """
         Update time-dependent blocks
@@ -217,9 +237,13 @@ class BloodVessel(LPNBlock):
         Q_in = np.abs(args["Solution"][args['Wire dictionary'][self.connecting_wires_list[0]].LPN_solution_ids[1]])
         fac1 = -self.stenosis_coefficient * Q_in
         fac2 = fac1 - self.R
-        self.mat['F'][[0, 2], 1] = fac2
-        self.mat['dF'][[0, 2], 1] = fac1
-        self.mats_to_assemble.update({"F", "dF"})
+        # only queue the matrices that changed (they do not change without a stenosis)
+        if self.mat['F'][0, 1] != fac2:
+            self.mat['F'][[0, 2], 1] = fac2
+            self.mats_to_assemble.add("F")
+        if self.mat['dF'][0, 1] != fac1:
+            self.mat['dF'][[0, 2], 1] = fac1
+            self.mats_to_assemble.add("dF")
 
 
 class UnsteadyResistanceWithDistalPressure(LPNBlock):
@@ -243,10 +267,15 @@ class UnsteadyResistanceWithDistalPressure(LPNBlock):
         the ordering is : (P_in,Q_in)
         """
         t = args['Time']
-        self.mat["F"][0, 1] = -self.Rfunc(t)
-        self.vec['C'][0] = -self.Pref_func(t)
-        self.mats_to_assemble.add("F")
-        self.vecs_to_assemble.add("C")
+        R = -self.Rfunc(t)
+        Pref = -self.Pref_func(t)
+        # only queue the matrices and vectors that changed
+        if self.mat["F"][0, 1] != R:
+            self.mat["F"][0, 1] = R
+            self.mats_to_assemble.add("F")
+        if self.vec['C'][0] != Pref:
+            self.vec['C'][0] = Pref
+            self.vecs_to_assemble.add("C")
 
 class UnsteadyPressureRef(LPNBlock):
     """
@@ -264,9 +293,11 @@ class UnsteadyPressureRef(LPNBlock):
 
     def update_time(self, args):
         t = args['Time']
-        self.vec['C'][0] = -self.Pfunc(t)
-        self.vecs_to_assemble.add("C")
-        self.mats_to_assemble.add("F")
+        P = -self.Pfunc(t)
+        # F is constant; only queue C if it changed
+        if self.vec['C'][0] != P:
+            self.vec['C'][0] = P
+            self.vecs_to_assemble.add("C")
 
 
 class UnsteadyFlowRef(LPNBlock):
@@ -284,9 +315,11 @@ class UnsteadyFlowRef(LPNBlock):
 
     def update_time(self, args):
         t = args['Time']
-        self.vec['C'][0] = -self.Qfunc(t)
-        self.vecs_to_assemble.add("C")
-        self.mats_to_assemble.add("F")
+        Q = -self.Qfunc(t)
+        # F is constant; only queue C if it changed
+        if self.vec['C'][0] != Q:
+            self.vec['C'][0] = Q
+            self.vecs_to_assemble.add("C")
 
 
 class UnsteadyRCRBlockWithDistalPressure(LPNBlock):
@@ -322,12 +355,20 @@ class UnsteadyRCRBlockWithDistalPressure(LPNBlock):
         """
         t = args['Time']
         Rd_t = self.Rd_func(t)
-        self.mat["E"][1, 2] = -Rd_t * self.C_func(t)
-        self.mat['F'][0, 1] = -self.Rp_func(t)
-        self.mat['F'][1, 1] = Rd_t
-        self.vec['C'][1] = self.Pref_func(t)
-        self.mats_to_assemble.update({"E", "F"})
-        self.vecs_to_assemble.add("C")
+        E_12 = -Rd_t * self.C_func(t)
+        F_01 = -self.Rp_func(t)
+        Pref = self.Pref_func(t)
+        # only queue the matrices and vectors that changed
+        if self.mat["E"][1, 2] != E_12:
+            self.mat["E"][1, 2] = E_12
+            self.mats_to_assemble.add("E")
+        if self.mat['F'][0, 1] != F_01 or self.mat['F'][1, 1] != Rd_t:
+            self.mat['F'][0, 1] = F_01
+            self.mat['F'][1, 1] = Rd_t
+            self.mats_to_assemble.add("F")
+        if self.vec['C'][1] != Pref:
+            self.vec['C'][1] = Pref
+            self.vecs_to_assemble.add("C")
 
 
 class OpenLoopCoronaryWithDistalPressureBlock(LPNBlock):
@@ -383,6 +424,10 @@ class OpenLoopCoronaryWithDistalPressureBlock(LPNBlock):
         ttt = args['Time']
         Pim_value = self.get_P_at_t(self.Pim, ttt)
         Pv_value = self.get_P_at_t(self.Pv, ttt)
-        self.vec["C"][0] = -self.Cim * Pim_value + self.Cim * Pv_value
-        self.vec["C"][1] = -self.Cim * (self.Rv + self.Ram) * Pim_value + self.Ram * self.Cim * Pv_value
-        self.vecs_to_assemble.add("C")
+        C_0 = -self.Cim * Pim_value + self.Cim * Pv_value
+        C_1 = -self.Cim * (self.Rv + self.Ram) * Pim_value + self.Ram * self.Cim * Pv_value
+        # only queue C if it changed
+        if self.vec["C"][0] != C_0 or self.vec["C"][1] != C_1:
+            self.vec["C"][0] = C_0
+            self.vec["C"][1] = C_1
+            self.vecs_to_assemble.add("C")
@@ -70,7 +70,7 @@ import pdb
 import sys
 import re
 import os
-import copy
+import bisect
 import numpy as np
 import scipy.interpolate
 
@@ -85,16 +85,6 @@ try:
 except ImportError:
     pass
 
-try:
-    import matplotlib.pyplot as plt # only needed if you want to visualize the 0d model as a directed graph
-except ImportError:
-    print("\nmatplotlib.pyplot not found. matplotlib.pyplot is needed only if you want to visualize your 0d model as a directed graph.")
-
-try:
-    import networkx as nx # only needed if you want to visualize the 0d model as a directed graph
-except ImportError:
-    print("\nnetworkx not found. networkx is needed only if you want to visualize your 0d model as a directed graph.")
-
 try:
     from profilehooks import profile # only needed if you want to profile this script
 except ImportError:
@@ -105,9 +95,16 @@ try:
 except ImportError:
     print("\njson not found.")
 
+try:
+    import orjson # only needed for faster parsing of large 0d solver input files; json is used otherwise
+except ImportError:
+    orjson = None
+
 import importlib
 import argparse
-from collections import defaultdict
+import functools
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
 def import_custom_0d_elements(custom_0d_elements_arguments_file_path):
     """
@@ -156,6 +153,8 @@ def create_unsteady_bc_value_function(time, bc_values):
     Caveats:
         1) bc_values must have the same start and end values, since periodic boundariess are used for the cubic spline
         2) bc_values and time must have the same length
+        3) the blocks evaluate the spline at a single time point per call, for which calling the scipy CubicSpline object (built for arrays of time points) has a large overhead
+            -- the spline is therefore evaluated directly from its piecewise polynomial coefficients, in the same way (and with the same result) as scipy.interpolate.PPoly
     Inputs:
         list time
             = [list of time points]
@@ -174,7 +173,23 @@ def create_unsteady_bc_value_function(time, bc_values):
             return bc_values[0]
         return function
     else:
-        return scipy.interpolate.CubicSpline(np.array(time), np.array(bc_values), bc_type = 'periodic')
+        spline = scipy.interpolate.CubicSpline(np.array(time), np.array(bc_values), bc_type = 'periodic')
+        breakpoints = spline.x.tolist()
+        coefficients = spline.c.T.tolist() # [c3, c2, c1, c0] of each interval, for the polynomial c3 * s**3 + c2 * s**2 + c1 * s + c0, where s is the time since the start of the interval
+        t_start = breakpoints[0]
+        period = breakpoints[-1] - t_start
+        last_interval = len(breakpoints) - 2
+        def function(t):
+            """
+            Periodic cubic spline boundary condition, evaluated at the time t
+            """
+            t = t_start + (t - t_start) % period
+            i = min(max(bisect.bisect_right(breakpoints, t) - 1, 0), last_interval)
+            s = t - breakpoints[i]
+            c3, c2, c1, c0 = coefficients[i]
+            s2 = s * s
+            return c0 + c1 * s + c2 * s2 + c3 * (s2 * s)
+        return function
 
 def create_junction_blocks(parameters, custom_0d_elements_arguments):
     """
@@ -337,62 +352,67 @@ def create_outlet_bc_blocks(parameters, custom_0d_elements_arguments):
     outlet_bc_blocks = {} # {block_name : block_object}
     outlet_vessels_of_model = use_steady_bcs.get_ids_of_cap_vessels(parameters, "outlet")
     vessel_id_to_boundary_condition_map = parameters["vessel_id_to_boundary_condition_map"]
+    simulation_parameters = parameters["simulation_parameters"] # every BC time series must span the cardiac cycle period set by the first one
     for vessel_id in outlet_vessels_of_model:
         block_name = "BC" + str(vessel_id) + "_outlet"
         connecting_block_list = ["V" + str(vessel_id)]
         flow_directions = [-1]
+        # look up the boundary condition of the vessel once; its type selects the block to create
+        boundary_condition = vessel_id_to_boundary_condition_map[vessel_id]["outlet"]
+        bc_type = boundary_condition["bc_type"]
+        boundary_condition_values = boundary_condition["bc_values"]
 
-        if vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_type"] == "RESISTANCE":
-            R = vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_values"]["R"]
+        if bc_type == "RESISTANCE":
+            R = boundary_condition_values["R"]
             R_func = create_unsteady_bc_value_function([0.0, 1.0], [R, R])
 
-            Pref = vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_values"]["Pd"]
+            Pref = boundary_condition_values["Pd"]
 
             Pref_func = create_unsteady_bc_value_function([0.0, 1.0], [Pref, Pref])
             outlet_bc_blocks[block_name] = ntwku.UnsteadyResistanceWithDistalPressure(connecting_block_list = connecting_block_list, Rfunc = R_func, Pref_func = Pref_func, name = block_name, flow_directions = flow_directions)
-        elif vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_type"] == "RCR":
-            Rp = vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_values"]["Rp"]
+        elif bc_type == "RCR":
+            Rp = boundary_condition_values["Rp"]
             Rp_func = create_unsteady_bc_value_function([0.0, 1.0], [Rp, Rp])
 
-            C = vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_values"]["C"]
+            C = boundary_condition_values["C"]
             C_func = create_unsteady_bc_value_function([0.0, 1.0], [C, C])
 
-            Rd = vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_values"]["Rd"]
+            Rd = boundary_condition_values["Rd"]
             Rd_func = create_unsteady_bc_value_function([0.0, 1.0], [Rd, Rd])
 
-            Pref = vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_values"]["Pd"]
+            Pref = boundary_condition_values["Pd"]
             Pref_func = create_unsteady_bc_value_function([0.0, 1.0], [Pref, Pref])
 
             outlet_bc_blocks[block_name] = ntwku.UnsteadyRCRBlockWithDistalPressure(Rp_func = Rp_func, C_func = C_func, Rd_func = Rd_func, Pref_func = Pref_func, connecting_block_list = connecting_block_list, name = block_name, flow_directions = flow_directions)
-        elif vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_type"] == "FLOW":
-            time = vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_values"]["t"]
-            bc_values = vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_values"]["Q"]
+        elif bc_type == "FLOW":
+            time = boundary_condition_values["t"]
+            bc_values = boundary_condition_values["Q"]
             Qfunc = create_unsteady_bc_value_function(time, bc_values)
             outlet_bc_blocks[block_name] = ntwku.UnsteadyFlowRef(connecting_block_list = connecting_block_list, Qfunc = Qfunc, name = block_name, flow_directions = flow_directions)
-        elif vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_type"] == "PRESSURE":
-            time = vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_values"]["t"]
-            bc_values = vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_values"]["P"]
+        elif bc_type == "PRESSURE":
+            time = boundary_condition_values["t"]
+            bc_values = boundary_condition_values["P"]
             Pfunc = create_unsteady_bc_value_function(time, bc_values)
             outlet_bc_blocks[block_name] = ntwku.UnsteadyPressureRef(connecting_block_list = connecting_block_list, Pfunc = Pfunc, name = block_name, flow_directions = flow_directions)
-        elif vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_type"] == "CORONARY":
+        elif bc_type == "CORONARY":
             "Publication reference: Kim, H. J. et al. Patient-specific modeling of blood flow and pressure in human coronary arteries. Annals of Biomedical Engineering 38, 3195–3209 (2010)."
-            Ra1 = vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_values"]["Ra1"]
-            Ra2 = vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_values"]["Ra2"]
-            Ca = vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_values"]["Ca"]
-            Cc = vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_values"]["Cc"]
-            Rv1 = vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_values"]["Rv1"]
-            Pv_distal_pressure = vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_values"]["P_v"]
+            Ra1 = boundary_condition_values["Ra1"]
+            Ra2 = boundary_condition_values["Ra2"]
+            Ca = boundary_condition_values["Ca"]
+            Cc = boundary_condition_values["Cc"]
+            Rv1 = boundary_condition_values["Rv1"]
+            Pv_distal_pressure = boundary_condition_values["P_v"]
 
-            time_of_intramyocardial_pressure = vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_values"]["t"]
+            time_of_intramyocardial_pressure = boundary_condition_values["t"]
 
-            bc_values_of_intramyocardial_pressure = vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_values"]["Pim"]
+            bc_values_of_intramyocardial_pressure = boundary_condition_values["Pim"]
 
-            if "cardiac_cycle_period" in parameters["simulation_parameters"]:
-                if time_of_intramyocardial_pressure[-1] - time_of_intramyocardial_pressure[0] != parameters["simulation_parameters"]["cardiac_cycle_period"]:
+            if "cardiac_cycle_period" in simulation_parameters:
+                if time_of_intramyocardial_pressure[-1] - time_of_intramyocardial_pressure[0] != simulation_parameters["cardiac_cycle_period"]:
                     message = "Error. The time series of the intramyocadial pressure for the coronary boundary condition for segment #" + str(vessel_id) + " does not have the same cardiac cycle period as the other boundary conditions.  All boundary conditions, including the inlet and outlet boundary conditions, should have the same prescribed cardiac cycle period. Note that each boundary conditions must be prescribed over exactly one cardiac cycle." # todo: fix bug where this code does not work if the user prescribes only a single time point for the intramyocadial pressure time history (the code should work though b/c prescription of a single time point for the intramyocardial pressure suggests a steady intramyocadial pressure)
                     raise RuntimeError(message)
             else:
-                parameters["simulation_parameters"].update({"cardiac_cycle_period": time_of_intramyocardial_pressure[-1] - time_of_intramyocardial_pressure[0]})
+                simulation_parameters["cardiac_cycle_period"] = time_of_intramyocardial_pressure[-1] - time_of_intramyocardial_pressure[0]
 
             Pim_func = np.zeros((len(time_of_intramyocardial_pressure), 2))
             Pv_distal_pressure_func = np.zeros((len(time_of_intramyocardial_pressure), 2))
@@ -403,11 +423,11 @@ def create_outlet_bc_blocks(parameters, custom_0d_elements_arguments):
             Pim_func[:, 1] = bc_values_of_intramyocardial_pressure
             Pv_distal_pressure_func[:, 1] = np.ones(len(time_of_intramyocardial_pressure))*Pv_distal_pressure
 
-            outlet_bc_blocks[block_name] = ntwku.OpenLoopCoronaryWithDistalPressureBlock(Ra = Ra1, Ca = Ca, Ram = Ra2, Cim = Cc, Rv = Rv1, Pim = Pim_func, Pv = Pv_distal_pressure_func, cardiac_cycle_period = parameters["simulation_parameters"]["cardiac_cycle_period"], connecting_block_list = connecting_block_list, name = block_name, flow_directions = flow_directions)
+            outlet_bc_blocks[block_name] = ntwku.OpenLoopCoronaryWithDistalPressureBlock(Ra = Ra1, Ca = Ca, Ram = Ra2, Cim = Cc, Rv = Rv1, Pim = Pim_func, Pv = Pv_distal_pressure_func, cardiac_cycle_period = simulation_parameters["cardiac_cycle_period"], connecting_block_list = connecting_block_list, name = block_name, flow_directions = flow_directions)
 
         else: # this is a custom, user-defined outlet bc block
             custom_0d_elements_arguments.outlet_bc_args[vessel_id].update({"connecting_block_list" : connecting_block_list, "flow_directions" : flow_directions, "name" : block_name})
-            outlet_bc_blocks[block_name] = create_custom_element(vessel_id_to_boundary_condition_map[vessel_id]["outlet"]["bc_type"], custom_0d_elements_arguments.outlet_bc_args[vessel_id])
+            outlet_bc_blocks[block_name] = create_custom_element(bc_type, custom_0d_elements_arguments.outlet_bc_args[vessel_id])
     parameters["blocks"].update(outlet_bc_blocks)
 
 def create_inlet_bc_blocks(parameters, custom_0d_elements_arguments):
@@ -426,42 +446,47 @@ def create_inlet_bc_blocks(parameters, custom_0d_elements_arguments):
     inlet_bc_blocks = {} # {block_name : block_object}
     inlet_vessels_of_model = use_steady_bcs.get_ids_of_cap_vessels(parameters, "inlet")
     vessel_id_to_boundary_condition_map = parameters["vessel_id_to_boundary_condition_map"]
+    simulation_parameters = parameters["simulation_parameters"] # every BC time series must span the cardiac cycle period set by the first one
     for vessel_id in inlet_vessels_of_model:
         block_name = "BC" + str(vessel_id) + "_inlet"
         connecting_block_list = ["V" + str(vessel_id)]
         flow_directions = [+1]
-        if vessel_id_to_boundary_condition_map[vessel_id]["inlet"]["bc_type"] == "FLOW":
-            time = vessel_id_to_boundary_condition_map[vessel_id]["inlet"]["bc_values"]["t"]
-            bc_values = vessel_id_to_boundary_condition_map[vessel_id]["inlet"]["bc_values"]["Q"]
+        # look up the boundary condition of the vessel once; its type selects the block to create
+        boundary_condition = vessel_id_to_boundary_condition_map[vessel_id]["inlet"]
+        bc_type = boundary_condition["bc_type"]
+        boundary_condition_values = boundary_condition["bc_values"]
+        if bc_type == "FLOW":
+            time = boundary_condition_values["t"]
+            bc_values = boundary_condition_values["Q"]
             Qfunc = create_unsteady_bc_value_function(time, bc_values)
             inlet_bc_blocks[block_name] = ntwku.UnsteadyFlowRef(Qfunc = Qfunc, connecting_block_list = connecting_block_list, name = block_name, flow_directions = flow_directions)
             if len(time) >= 2:
                 cardiac_cycle_period = time[-1] - time[0]
-            if "cardiac_cycle_period" in parameters["simulation_parameters"]:
-                if cardiac_cycle_period != parameters["simulation_parameters"]["cardiac_cycle_period"]:
+            if "cardiac_cycle_period" in simulation_parameters:
+                if cardiac_cycle_period != simulation_parameters["cardiac_cycle_period"]:
                     message = "Error. The time series of the boundary condition for segment #" + str(vessel_id) + " does not have the same cardiac cycle period as the other boundary conditions.  All boundary conditions, including the inlet and outlet boundary conditions, should have the same prescribed cardiac cycle period. Note that each boundary conditions must be prescribed over exactly one cardiac cycle."
                     raise RuntimeError(message)
             else:
-                parameters["simulation_parameters"].update({"cardiac_cycle_period" : cardiac_cycle_period})
-        elif vessel_id_to_boundary_condition_map[vessel_id]["inlet"]["bc_type"] == "PRESSURE":
-            time = vessel_id_to_boundary_condition_map[vessel_id]["inlet"]["bc_values"]["t"]
-            bc_values = vessel_id_to_boundary_condition_map[vessel_id]["inlet"]["bc_values"]["P"]
+                simulation_parameters["cardiac_cycle_period"] = cardiac_cycle_period
+        elif bc_type == "PRESSURE":
+            time = boundary_condition_values["t"]
+            bc_values = boundary_condition_values["P"]
             Pfunc = create_unsteady_bc_value_function(time, bc_values)
             inlet_bc_blocks[block_name] = ntwku.UnsteadyPressureRef(Pfunc = Pfunc, connecting_block_list = connecting_block_list, name = block_name, flow_directions = flow_directions)
             if len(time) >= 2:
                 cardiac_cycle_period = time[-1] - time[0]
-            if "cardiac_cycle_period" in parameters["simulation_parameters"]:
-                if cardiac_cycle_period != parameters["simulation_parameters"]["cardiac_cycle_period"]:
+            if "cardiac_cycle_period" in simulation_parameters:
+                if cardiac_cycle_period != simulation_parameters["cardiac_cycle_period"]:
                     message = "Error. The time series of the boundary condition for segment #" + str(vessel_id) + " does not have the same cardiac cycle period as the other boundary conditions.  All boundary conditions, including the inlet and outlet boundary conditions, should have the same prescribed cardiac cycle period. Note that each boundary conditions must be prescribed over exactly one cardiac cycle."
                     raise RuntimeError(message)
             else:
-                parameters["simulation_parameters"].update({"cardiac_cycle_period" : cardiac_cycle_period})
+                simulation_parameters["cardiac_cycle_period"] = cardiac_cycle_period
         else: # this is a custom, user-defined inlet bc block
             custom_0d_elements_arguments.inlet_bc_args[vessel_id].update({"connecting_block_list" : connecting_block_list, "flow_directions" : flow_directions, "name" : block_name})
-            inlet_bc_blocks[block_name] = create_custom_element(vessel_id_to_boundary_condition_map[vessel_id]["inlet"]["bc_type"], custom_0d_elements_arguments.inlet_bc_args[vessel_id])
+            inlet_bc_blocks[block_name] = create_custom_element(bc_type, custom_0d_elements_arguments.inlet_bc_args[vessel_id])
     parameters["blocks"].update(inlet_bc_blocks)
 
-def create_LPN_blocks(parameters, custom_0d_elements_arguments):
+def create_LPN_blocks(parameters, custom_0d_elements_arguments, junction_and_vessel_blocks = None):
     """
     Purpose:
         Create all LPNBlock objects for the 0d model.
@@ -470,16 +495,29 @@ def create_LPN_blocks(parameters, custom_0d_elements_arguments):
             -- created from function utils.extract_info_from_solver_input_file
         module custom_0d_elements_arguments
             = module to call custom 0d element arguments from
+        dict junction_and_vessel_blocks
+            = {block_name : block_object} of the junction and vessel blocks created by a previous call to create_LPN_blocks for the same 0d model (e.g. for the steady simulation, which differs only in its BCs)
+            -- if provided, these blocks are reset and reused; only the BC blocks are created
     Returns:
         void, but updates parameters to include:
             dict blocks
                 = {block_name : block_object}
                 -- where the values are the junction, vessel, outlet BC, and inlet BC block objects
+            dict junction_and_vessel_blocks
+                = {block_name : block_object}
+                -- where the values are just the junction and vessel block objects
     """
     blocks = {}  # {block_name : block_object}
     parameters.update({"blocks" : blocks})
-    create_junction_blocks(parameters, custom_0d_elements_arguments)
-    create_vessel_blocks(parameters, custom_0d_elements_arguments)
+    parameters.pop("network", None) # the wires of previously created blocks do not apply to the new blocks
+    if junction_and_vessel_blocks is None:
+        create_junction_blocks(parameters, custom_0d_elements_arguments)
+        create_vessel_blocks(parameters, custom_0d_elements_arguments)
+    else:
+        for block in junction_and_vessel_blocks.values():
+            block.reset()
+        blocks.update(junction_and_vessel_blocks)
+    parameters.update({"junction_and_vessel_blocks" : dict(blocks)})
     use_steady_bcs.create_vessel_id_to_boundary_condition_map(parameters)
     create_outlet_bc_blocks(parameters, custom_0d_elements_arguments)
     create_inlet_bc_blocks(parameters, custom_0d_elements_arguments)
@@ -499,12 +537,58 @@ def set_solver_parameters(parameters):
             int total_number_of_simulated_time_steps
                 = total number of time steps to simulate for the entire 0d simulation
     """
-    if "cardiac_cycle_period" not in parameters["simulation_parameters"]:
-        parameters["simulation_parameters"].update({"cardiac_cycle_period" : 1.0}) # default period of cardiac cycle [sec]
-    delta_t = parameters["simulation_parameters"]["cardiac_cycle_period"]/(parameters["simulation_parameters"]["number_of_time_pts_per_cardiac_cycle"] - 1)
-    parameters["simulation_parameters"].update({"delta_t" : delta_t})
-    total_number_of_simulated_time_steps = int((parameters["simulation_parameters"]["number_of_time_pts_per_cardiac_cycle"] - 1)*parameters["simulation_parameters"]["number_of_cardiac_cycles"] + 1)
-    parameters["simulation_parameters"].update({"total_number_of_simulated_time_steps" : total_number_of_simulated_time_steps})
+    simulation_parameters = parameters["simulation_parameters"]
+    cardiac_cycle_period = simulation_parameters.setdefault("cardiac_cycle_period", 1.0) # default period of cardiac cycle [sec]
+    number_of_time_pts_per_cardiac_cycle = simulation_parameters["number_of_time_pts_per_cardiac_cycle"]
+    simulation_parameters["delta_t"] = cardiac_cycle_period/(number_of_time_pts_per_cardiac_cycle - 1)
+    simulation_parameters["total_number_of_simulated_time_steps"] = int((number_of_time_pts_per_cardiac_cycle - 1)*simulation_parameters["number_of_cardiac_cycles"] + 1)
+
+def _set_solver_parameters_fast(parameters, number_of_time_pts_per_cardiac_cycle, number_of_cardiac_cycles, cardiac_cycle_period = 1.0):
+    """
+    Purpose:
+        Set the 0d simulation time-stepping parameters for a fixed number of time points per cardiac cycle and number of cardiac cycles (e.g. for the steady simulation used to compute the initial conditions)
+    Inputs:
+        dict parameters
+            -- created from function utils.extract_info_from_solver_input_file
+        int number_of_time_pts_per_cardiac_cycle
+        int number_of_cardiac_cycles
+        float cardiac_cycle_period
+            = default period of the cardiac cycle, used only if parameters["simulation_parameters"] does not prescribe one
+    Returns:
+        void, but updates parameters["simulation_parameters"] in the same way as set_solver_parameters
+    """
+    simulation_parameters = parameters["simulation_parameters"]
+    cardiac_cycle_period = simulation_parameters.setdefault("cardiac_cycle_period", cardiac_cycle_period)
+    simulation_parameters["number_of_time_pts_per_cardiac_cycle"] = number_of_time_pts_per_cardiac_cycle
+    simulation_parameters["number_of_cardiac_cycles"] = number_of_cardiac_cycles
+    simulation_parameters["delta_t"] = cardiac_cycle_period/(number_of_time_pts_per_cardiac_cycle - 1)
+    simulation_parameters["total_number_of_simulated_time_steps"] = (number_of_time_pts_per_cardiac_cycle - 1)*number_of_cardiac_cycles + 1
+
+LPNNetwork = namedtuple("LPNNetwork", ["block_list", "connect_list", "wire_dict", "neq", "var_name_list"])
+
+def connect_LPN_blocks(parameters):
+    """
+    Purpose:
+        Connect the LPNBlock objects of the 0d model with wires and assign the global ids of the solution variables
+    Inputs:
+        dict parameters
+            -- created from function create_LPN_blocks
+    Returns:
+        LPNNetwork network
+            = (block_list, connect_list, wire_dict, neq, var_name_list), where
+                block_list = [list of all of the 0d LPNBlock objects]
+                connect_list = [list of (blockA_index, blockB_index)] of the connected blocks in block_list
+                wire_dict = {wire_name : wire_object}
+                neq = number of equations governing the 0d model
+                var_name_list = list of the names of the 0d solution variables (see run_network_util)
+    """
+    block_list = list(parameters["blocks"].values())
+    connect_list, wire_dict = connections.connect_blocks_by_inblock_list(block_list)
+    neq = connections.compute_neq(block_list, wire_dict) # number of equations governing the 0d model
+    for block in block_list: # run a consistency check
+        connections.check_block_connection(block)
+    var_name_list = connections.assign_global_ids(block_list, wire_dict) # assign solution variables with global ID
+    return LPNNetwork(block_list, connect_list, wire_dict, neq, var_name_list)
 
 def load_in_ics(var_name_list, ICs_dict):
 
@@ -512,13 +596,14 @@ def load_in_ics(var_name_list, ICs_dict):
     y_initial_loaded = ICs_dict["y"]
     ydot_initial_loaded = ICs_dict["ydot"]
 
-    y_initial = np.zeros(len(var_name_list))
-    ydot_initial = np.zeros(len(var_name_list))
-    for i in range(len(var_name_list)):
-        var_name = var_name_list[i]
-        ind = var_name_list_loaded.index(var_name)
-        y_initial[i] = y_initial_loaded[ind]
-        ydot_initial[i] = ydot_initial_loaded[ind]
+    if var_name_list_loaded is var_name_list or var_name_list_loaded == var_name_list: # the ICs are already in the order of var_name_list
+        num_vars = len(var_name_list) # the loaded arrays can be longer than var_name_list (e.g. for coronary BCs with a time-varying Pim); ignore the trailing entries, as the lookup below does
+        return np.asarray(y_initial_loaded, dtype = float)[:num_vars], np.asarray(ydot_initial_loaded, dtype = float)[:num_vars]
+
+    var_name_to_loaded_index = {var_name : i for i, var_name in enumerate(var_name_list_loaded)}
+    ind = np.fromiter((var_name_to_loaded_index[var_name] for var_name in var_name_list), dtype = np.intp, count = len(var_name_list))
+    y_initial = np.asarray(y_initial_loaded, dtype = float)[ind]
+    ydot_initial = np.asarray(ydot_initial_loaded, dtype = float)[ind]
 
     return y_initial, ydot_initial
 
@@ -561,15 +646,13 @@ def run_network_util(zero_d_solver_input_file_path, parameters, draw_directed_gr
             = list of the names of the 0d simulation results; most of the items in var_name_list are the QoIs + the names of the wires used in the 0d model (the wires connect the 0d blocks), where the wire names are usually comprised of the wire's inlet block name + "_" + the wire's outlet block name
     """
 
-    block_list = list(parameters["blocks"].values())
-    connect_list, wire_dict = connections.connect_blocks_by_inblock_list(block_list)
+    # the blocks are connected only once; parameters["network"] is reused if the same blocks are simulated again (e.g. after the steady simulation)
+    if "network" not in parameters:
+        parameters["network"] = connect_LPN_blocks(parameters)
+    block_list, connect_list, wire_dict, neq, var_name_list = parameters["network"]
     if draw_directed_graph == True: # todo: should I move this draw_directed_graph to a separate function outside of run_network_util, since this stuff is completely separate
         directed_graph_file_path = os.path.splitext(zero_d_solver_input_file_path)[0] + "_directed_graph"
         save_directed_graph(block_list, connect_list, directed_graph_file_path)
-    neq = connections.compute_neq(block_list, wire_dict) # number of equations governing the 0d model
-    for block in block_list: # run a consistency check
-        connections.check_block_connection(block)
-    var_name_list = connections.assign_global_ids(block_list, wire_dict) # assign solution variables with global ID
 
     # initialize solution structures
     if use_ICs_from_npy_file:
@@ -591,9 +674,14 @@ def run_network_util(zero_d_solver_input_file_path, parameters, draw_directed_gr
 
     print("starting simulation")
 
-    ylist = [y_next.copy()]
     parameters["initial_time"] = simulation_start_time
-    tlist = np.array([ parameters["initial_time"] + _*parameters["simulation_parameters"]["delta_t"] for _ in range(0, parameters["simulation_parameters"]["total_number_of_simulated_time_steps"])])
+    delta_t = parameters["simulation_parameters"]["delta_t"]
+    tlist = parameters["initial_time"] + np.arange(parameters["simulation_parameters"]["total_number_of_simulated_time_steps"])*delta_t
+
+    # the solution at every time point is written directly into a preallocated array, where row i holds the solution at tlist[i]
+    # -- the array is column-major, so the time series of each solution variable is contiguous for the reformatting of the results
+    results_0d = np.empty((len(tlist), len(y_next)), order = "F")
+    results_0d[0] = y_next
 
     # create time integration
     t_int = time_int.GenAlpha(rho, y_next)
@@ -603,23 +691,61 @@ def run_network_util(zero_d_solver_input_file_path, parameters, draw_directed_gr
     else:
         loop_list = tlist[:-1]
 
-    for t_current in loop_list:
+    # bind the per-step callable once, outside of the time loop
+    step = t_int.step
+    for i, t_current in enumerate(loop_list, start = 1):
         args['Solution'] = y_next
-        y_next, ydot_next = t_int.step(y_next, ydot_next, t_current, block_list, args, parameters["simulation_parameters"]["delta_t"])
-        ylist.append(y_next)
+        y_next, ydot_next = step(y_next, ydot_next, t_current, block_list, args, delta_t)
+        results_0d[i] = y_next
 
     if save_y_ydot_to_npy:
         save_ics(y_ydot_file_path, y_next, ydot_next, var_name_list)
 
-    var_name_list_original = copy.deepcopy(var_name_list)
-    results_0d = np.array(ylist)
+    var_name_list_original = list(var_name_list) # the names are strings, so a shallow copy is a full copy
     zero_d_time = tlist
     return zero_d_time, results_0d, var_name_list, y_next, ydot_next, var_name_list_original
 
 def save_ics(y_ydot_file_path, y_next, ydot_next, var_name_list):
     np.save(y_ydot_file_path, {"y" : y_next, "ydot" : ydot_next, "var_name_list" : var_name_list})
 
-def reformat_network_util_results_all(zero_d_time, results_0d, var_name_list):
+ParsedVarNames = namedtuple("ParsedVarNames", ["names", "qoi_headers", "first_tokens", "second_tokens", "third_tokens", "qoi_kinds"])
+
+_QOI_FLOW, _QOI_PRESSURE, _QOI_INTERNAL, _QOI_OTHER = range(4) # qoi codes of the solution variables
+_QOIS = ("flow", "pressure", "internal") # qoi names indexed by qoi code
+_QOI_HEADERS = ("Q", "P", "var") # var_name headers indexed by qoi code
+
+def parse_var_names(var_name_list):
+    """
+    Purpose:
+        Split every solution variable name in var_name_list on its first three underscores at once, using numpy.char instead of a python-level split per name
+        -- the result holds everything that reformat_network_util_results_all and reformat_network_util_results_branch need from the names, so var_name_list is only walked once for both
+    Inputs:
+        list var_name_list
+            = list of the 0d simulation results' solution variable names (var_name_list generated from run_network_util)
+    Returns:
+        ParsedVarNames parsed_var_names
+            = (names, qoi_headers, first_tokens, second_tokens, third_tokens, qoi_kinds), where
+                names = var_name_list as an np.array
+                qoi_headers = the part of each var_name before the first underscore; "Q", "P", or "var"
+                first_tokens, second_tokens, third_tokens = the parts of each var_name between the next underscores; "" where var_name has fewer parts
+                Example:
+                    for var_name = "Q_BC0_inlet_V0", qoi_header = "Q", first_token = "BC0", second_token = "inlet", third_token = "V0"
+                qoi_kinds = int8 array with _QOI_FLOW, _QOI_PRESSURE, or _QOI_INTERNAL for each var_name, according to its qoi_header, and _QOI_OTHER for var_names without a known qoi header
+    """
+    names = np.asarray(var_name_list, dtype = str)
+    rest = names
+    tokens = []
+    for _ in range(4):
+        parts = np.char.partition(rest, "_").reshape(-1, 3)
+        tokens.append(parts[:, 0])
+        rest = parts[:, 2]
+    has_qoi_header = np.char.str_len(tokens[0]) < np.char.str_len(names) # var_name contains an underscore after its qoi header
+    qoi_kinds = np.full(len(names), _QOI_OTHER, dtype = np.int8)
+    for qoi_kind, qoi_header in enumerate(_QOI_HEADERS):
+        qoi_kinds[has_qoi_header & (tokens[0] == qoi_header)] = qoi_kind
+    return ParsedVarNames(names, *tokens, qoi_kinds)
+
+def reformat_network_util_results_all(zero_d_time, results_0d, var_name_list, parsed_var_names = None):
     """
     Purpose:
         Reformat all 0d simulation results (results_0d) into a dictionary (zero_d_results_for_var_names)
@@ -632,6 +758,8 @@ def reformat_network_util_results_all(zero_d_time, results_0d, var_name_list):
             = list of the 0d simulation results' solution variable names; most of the items in var_name_list are the QoIs + the names of the wires used in the 0d model (the wires connecting the 0d LPNBlock objects), where the wire names are usually comprised of the wire's inlet block name + "_" + the wire's outlet block name
                 Example:
                     for var_name_list = ['P_V6_BC6_outlet', 'Q_V6_BC6_outlet'], then results_0d[:, i] holds the pressure (i = 0) or flow rate simulation result (i = 1) (both as np.arrays) for wire R6_BC6_outlet. This wire connects a resistance vessel block to an outlet BC block (specifically for vessel segment #6)
+        ParsedVarNames parsed_var_names
+            -- created from function parse_var_names; computed from var_name_list if not provided
     Returns:
         dict zero_d_results_for_var_names
             =   {
@@ -645,69 +773,127 @@ def reformat_network_util_results_all(zero_d_time, results_0d, var_name_list):
 
                         where var_name is an item in var_name_list (var_name_list generated from run_network_util)
                 }
+
+            -- the solution arrays of each qoi ("flow", "pressure", "internal") are contiguous views into a single copy of the corresponding columns of results_0d, so they share storage with each other
     """
-    zero_d_results_for_var_names = {"flow" : {}, "pressure" : {}, "time" : zero_d_time, "internal" : {}}
-    for i in range(len(var_name_list)):
-        var_name = var_name_list[i]
-        res = results_0d[:, i]
-        if var_name.startswith("Q_"):
-            zero_d_results_for_var_names["flow"][var_name] = res
-        elif var_name.startswith("P_"):
-            zero_d_results_for_var_names["pressure"][var_name] = res
-        elif var_name.startswith("var_"):
-            zero_d_results_for_var_names["internal"][var_name] = res
-        else:
-            message = "Error. There are unaccounted for solution variables here, for var_name = " + var_name
-            raise RuntimeError(message)
+    zero_d_results_for_var_names = {"time" : zero_d_time}
+    if parsed_var_names is None:
+        parsed_var_names = parse_var_names(var_name_list)
+    names = parsed_var_names.names
+    qoi_kinds = parsed_var_names.qoi_kinds
+    for qoi_kind, qoi in enumerate(_QOIS):
+        qoi_mask = qoi_kinds == qoi_kind
+        # gathering the columns of results_0d.T yields a C-contiguous array whose row i holds the solution for the i-th var_name of this qoi
+        zero_d_results_for_var_names[qoi] = dict(zip(names[qoi_mask].tolist(), results_0d.T[qoi_mask]))
+    unaccounted_for = qoi_kinds == _QOI_OTHER
+    if np.any(unaccounted_for):
+        message = "Error. There are unaccounted for solution variables here, for var_name = " + names[unaccounted_for][0]
+        raise RuntimeError(message)
     return zero_d_results_for_var_names
 
-def get_vessel_id_to_length_map(parameters):
-    vessel_id_to_length_map = {}
+VesselIndex = namedtuple("VesselIndex", ["lengths", "names", "branch_seg"])
+
+_VESSEL_NAME_RE = re.compile(r"[A-Za-z]+([0-9]+)[^_]*_[A-Za-z]+([0-9]+)") # a vessel name, e.g. "branch0_seg2"; the groups are the branch id and the branch segment id
+
+def build_vessel_index(parameters):
+    """
+    Purpose:
+        Build the vessel lookup tables used to reformat the 0d simulation results in a single pass over parameters["vessels"].
+    Inputs:
+        dict parameters
+            -- created from function utils.extract_info_from_solver_input_file
+    Returns:
+        VesselIndex vessel_index
+            = (lengths, names, branch_seg), where
+                lengths = {vessel_id : vessel_length}
+                names = {vessel_id : vessel_name}
+                branch_seg = {vessel_id : (branch_id, branch_segment_id)}, parsed from vessel names of the form "branch<branch_id>_seg<branch_segment_id>"
+    Caveats:
+        raises a ValueError if a vessel name is not of that form; use get_vessel_id_to_length_map and get_vessel_id_to_vessel_name_map for models whose vessel names are not
+    """
+    lengths = {}
+    names = {}
+    branch_seg = {}
     for vessel in parameters["vessels"]:
         vessel_id = vessel["vessel_id"]
-        vessel_length = vessel["vessel_length"]
-        vessel_id_to_length_map[vessel_id] = vessel_length
-    return vessel_id_to_length_map
+        vessel_name = vessel["vessel_name"]
+        lengths[vessel_id] = vessel["vessel_length"]
+        names[vessel_id] = vessel_name
+        match = _VESSEL_NAME_RE.match(vessel_name)
+        if match is None:
+            message = "Error. The name of vessel " + str(vessel_id) + ", " + vessel_name + ", is not of the form 'branch<branch_id>_seg<branch_segment_id>', which is needed to reformat the 0d simulation results by branch."
+            raise ValueError(message)
+        branch_id, branch_segment_id = match.groups()
+        branch_seg[vessel_id] = (int(branch_id), int(branch_segment_id))
+    return VesselIndex(lengths, names, branch_seg)
 
-def initialize_0d_results_dict_branch(parameters, zero_d_time):
-    zero_d_results = {"flow" : {}, "pressure" : {}, "distance" : {}}
+def get_vessel_id_to_length_map(parameters):
+    return {vessel["vessel_id"] : vessel["vessel_length"] for vessel in parameters["vessels"]}
+
+def initialize_0d_results_dict_branch(parameters, zero_d_time, vessel_index = None):
+    if vessel_index is None:
+        vessel_index = build_vessel_index(parameters)
     num_time_pts = len(zero_d_time)
     branch_segment_ids = defaultdict(list) # {branch_id : [branch_segment_ids]}
     branch_id_to_vessel_id_map = defaultdict(dict) # {branch_id : {branch_segment_id : vessel_id}}
-    vessel_id_to_length_map = get_vessel_id_to_length_map(parameters)
+    vessel_id_to_length_map = vessel_index.lengths
 
-    for vessel in parameters["vessels"]:
-        vessel_id = vessel["vessel_id"]
-        vessel_name = vessel["vessel_name"]
-        vessel_name_split = vessel_name.split("_")
-        branch_id = int((re.match(r"([a-z]+)([0-9]+)", vessel_name_split[0], re.I)).groups()[1])
-        branch_segment_id = int((re.match(r"([a-z]+)([0-9]+)", vessel_name_split[1], re.I)).groups()[1])
+    for vessel_id, (branch_id, branch_segment_id) in vessel_index.branch_seg.items():
         branch_segment_ids[branch_id].append(branch_segment_id)
         branch_id_to_vessel_id_map[branch_id][branch_segment_id] = vessel_id
 
+    zero_d_results = {"flow" : {}, "pressure" : {}, "distance" : {}}
+
     for branch_id in branch_segment_ids:
         num_nodes_for_branch = max(branch_segment_ids[branch_id]) + 2
         for qoi in zero_d_results:
             zero_d_results[qoi][branch_id] = np.zeros((num_nodes_for_branch, num_time_pts))
         zero_d_results["distance"][branch_id] = np.zeros(num_nodes_for_branch)
         branch_segment_ids[branch_id].sort() # sort by ascending order of branch_segment_id
-        counter = 0
-        for branch_segment_id in branch_segment_ids[branch_id]:
-            vessel_id = branch_id_to_vessel_id_map[branch_id][branch_segment_id]
-            zero_d_results["distance"][branch_id][branch_segment_id + 1] = zero_d_results["distance"][branch_id][counter] + vessel_id_to_length_map[vessel_id]
-            counter += 1
+        # the distance of each 0d node along the centerline is the cumulative length of the upstream segments
+        lengths = np.fromiter((vessel_id_to_length_map[branch_id_to_vessel_id_map[branch_id][branch_segment_id]] for branch_segment_id in branch_segment_ids[branch_id]), dtype=np.float64)
+        zero_d_results["distance"][branch_id][1:len(lengths) + 1] = np.cumsum(lengths)
     zero_d_results["time"] = zero_d_time
     return zero_d_results
 
 def get_vessel_id_to_vessel_name_map(parameters):
-    vessel_id_to_vessel_name_map = {}
-    for vessel in parameters["vessels"]:
-        vessel_id = vessel["vessel_id"]
-        vessel_name = vessel["vessel_name"]
-        vessel_id_to_vessel_name_map[vessel_id] = vessel_name
-    return vessel_id_to_vessel_name_map
+    return {vessel["vessel_id"] : vessel["vessel_name"] for vessel in parameters["vessels"]}
+
+# classes of the solution variables in var_name_list, keyed by the block connected upstream of the wire
+_VAR_VESSEL, _VAR_BC, _VAR_JUNCTION, _VAR_SKIP = range(4)
+
+def classify_var_names(var_name_list, parsed_var_names = None):
+    """
+    Purpose:
+        Classify every solution variable name by the type of block connected upstream of its wire
+    Inputs:
+        list var_name_list
+            = list of the 0d simulation results' solution variable names (var_name_list generated from run_network_util)
+        ParsedVarNames parsed_var_names
+            -- created from function parse_var_names; computed from var_name_list if not provided
+    Returns:
+        np.array class_ids
+            = int8 array with _VAR_VESSEL, _VAR_BC, or _VAR_JUNCTION for wires and _VAR_SKIP for the internal variables of the blocks
+    """
+    if parsed_var_names is None:
+        parsed_var_names = parse_var_names(var_name_list)
+    names = parsed_var_names.names
+    block_names = parsed_var_names.first_tokens
+    class_ids = np.full(len(names), _VAR_SKIP, dtype = np.int8)
+    is_wire = np.char.find(names, "var") < 0
+    # the only possible combination of wire connections are: 1) vessel <--> vessel 2) vessel <--> junction 3) vessel <--> boundary condition; in all of these cases, there is at least one vessel block ("V") in each wire_name
+    if np.any(is_wire & (np.char.find(names, "V") < 0)):
+        message = 'Error. It is expected that every wire in the 0d model must be connected to at least one vessel block.'
+        raise RuntimeError(message)
+    class_ids[is_wire & np.char.startswith(block_names, "V")] = _VAR_VESSEL
+    class_ids[is_wire & np.char.startswith(block_names, "BC")] = _VAR_BC
+    class_ids[is_wire & np.char.startswith(block_names, "J")] = _VAR_JUNCTION
+    if np.any(is_wire & (class_ids == _VAR_SKIP)):
+        message = 'Error. It is not possible for a block name to begin with something other than, "V", "J", or "BC".'
+        raise RuntimeError(message)
+    return class_ids
 
-def reformat_network_util_results_branch(zero_d_time, results_0d, var_name_list, parameters):
+def reformat_network_util_results_branch(zero_d_time, results_0d, var_name_list, parameters, vessel_index = None, parsed_var_names = None):
     """
     Purpose:
         Reformat the 0d simulation results for just the branches into a dictionary (zero_d_results)
@@ -722,6 +908,10 @@ def reformat_network_util_results_branch(zero_d_time, results_0d, var_name_list,
                     for var_name_list = ['P_V6_BC6_outlet', 'Q_V6_BC6_outlet'], then results_0d[:, i] holds the pressure (i = 0) or flow rate simulation result (i = 1) (both as np.arrays) for wire R6_BC6_outlet. This wire connects a resistance vessel block to an outlet BC block (specifically for vessel segment #6)
         dict parameters
             -- created from function utils.extract_info_from_solver_input_file
+        VesselIndex vessel_index
+            -- created from function build_vessel_index; built from parameters if not provided
+        ParsedVarNames parsed_var_names
+            -- created from function parse_var_names; computed from var_name_list if not provided
     Returns:
         dict zero_d_results
             =   {
@@ -741,56 +931,51 @@ def reformat_network_util_results_branch(zero_d_time, results_0d, var_name_list,
                 2. plt.plot(zero_d_results["distance"], zero_d_results["pressure"][branch_id][:, -1])
                         --> plot centerline distance vs the 0d pressure (at the last simulated time step); this yields a plot that shows how the pressure changes along the axial dimension of a vessel
     """
-    qoi_map = {"Q" : "flow", "P" : "pressure"}
-    zero_d_results = initialize_0d_results_dict_branch(parameters, zero_d_time)
-    vessel_id_to_vessel_name_map = get_vessel_id_to_vessel_name_map(parameters)
-
-    for i in range(len(var_name_list)):
-        if ("var" not in var_name_list[i]): # var_name_list[i] == wire_name
-            # the only possible combination of wire connections are: 1) vessel <--> vessel 2) vessel <--> junction 3) vessel <--> boundary condition; in all of these cases, there is at least one vessel block ("V") in each wire_name
-            if "V" not in var_name_list[i]:
-                message = 'Error. It is expected that every wire in the 0d model must be connected to at least one vessel block.'
-                raise RuntimeError(message)
-            else:
-                # parse var_name
-                var_name_split = var_name_list[i].split("_")
-                qoi_header = var_name_split[0]
-
-                if var_name_split[1].startswith("V"): # the wire connected downstream of this vessel block
-                    vessel_id = int(var_name_split[1][1:])
-                    vessel_name = vessel_id_to_vessel_name_map[vessel_id]
-                    vessel_name_split = vessel_name.split("_")
-                    branch_id = int((re.match(r"([a-z]+)([0-9]+)", vessel_name_split[0], re.I)).groups()[1])
-                    branch_segment_id = int((re.match(r"([a-z]+)([0-9]+)", vessel_name_split[1], re.I)).groups()[1])
-                    branch_node_id = branch_segment_id + 1
-                    zero_d_results[qoi_map[qoi_header]][branch_id][branch_node_id, :] = results_0d[:, i]
-                else: # need to find the inlet wire/node of the branch
-                    if var_name_split[1].startswith("BC"): # inlet wire/node of the branch
-                        vessel_id = int(var_name_split[3][1:])
-                        vessel_name = vessel_id_to_vessel_name_map[vessel_id]
-                        vessel_name_split = vessel_name.split("_")
-                        branch_id = int((re.match(r"([a-z]+)([0-9]+)", vessel_name_split[0], re.I)).groups()[1])
-                        branch_segment_id = int((re.match(r"([a-z]+)([0-9]+)", vessel_name_split[1], re.I)).groups()[1])
-                        if branch_segment_id != 0:
-                            message = 'Error. branch_segment_id should be 0 here because we are at the inlet wire of the branch.'
-                            raise RuntimeError(message)
-                        else:
-                            branch_node_id = branch_segment_id
-                            zero_d_results[qoi_map[qoi_header]][branch_id][branch_node_id, :] = results_0d[:, i]
-                    elif var_name_split[1].startswith("J"): # this wire could either be 1) the inlet wire/node of a branch or 2) some internal wire in the branch (where that internal wire is 1) connecting 2 vessel blocks or 2) connecting a vessel block and a junction block) (and we dont care about internal wires)
-                        vessel_id = int(var_name_split[2][1:])
-                        vessel_name = vessel_id_to_vessel_name_map[vessel_id]
-                        vessel_name_split = vessel_name.split("_")
-                        branch_id = int((re.match(r"([a-z]+)([0-9]+)", vessel_name_split[0], re.I)).groups()[1])
-                        branch_segment_id = int((re.match(r"([a-z]+)([0-9]+)", vessel_name_split[1], re.I)).groups()[1])
-                        if branch_segment_id == 0: # this is the inlet wire/node of the branch
-                            branch_node_id = branch_segment_id
-                            zero_d_results[qoi_map[qoi_header]][branch_id][branch_node_id, :] = results_0d[:, i]
-                        else: # this is an internal wire/node in the branch
-                            pass # do nothing here, since we are ignoring the internal wires where the vessel block is connected downstream of the wire (and the junction block is connected upstream of the wire)
-                    else:
-                        message = 'Error. It is not possible for a block name to begin with something other than, "V", "J", or "BC".'
-                        raise RuntimeError(message)
+    if vessel_index is None:
+        vessel_index = build_vessel_index(parameters)
+    zero_d_results = initialize_0d_results_dict_branch(parameters, zero_d_time, vessel_index)
+
+    # classify every solution variable once, then only visit the wires that carry branch results
+    if parsed_var_names is None:
+        parsed_var_names = parse_var_names(var_name_list)
+    class_ids = classify_var_names(var_name_list, parsed_var_names)
+    _, _, first_tokens, second_tokens, third_tokens, qoi_kinds = parsed_var_names
+    # the vessel block of the wire is the 1st block for vessel wires, the 3rd token for inlet BC wires (BC#_inlet_V#), and the 2nd block for junction wires
+    vessel_tokens = np.where(class_ids == _VAR_VESSEL, first_tokens, np.where(class_ids == _VAR_BC, third_tokens, second_tokens))
+    wire_ids = np.flatnonzero(class_ids != _VAR_SKIP)
+    vessel_ids = np.char.lstrip(vessel_tokens[wire_ids], "V").astype(np.intp)
+    wire_class_ids = class_ids[wire_ids]
+
+    # look up (branch_id, branch_segment_id) of every wire's vessel at once
+    vessel_id_to_branch_seg_map = vessel_index.branch_seg
+    branch_seg_table = np.full((max(vessel_id_to_branch_seg_map) + 1, 2), -1, dtype = np.intp)
+    branch_seg_table[list(vessel_id_to_branch_seg_map)] = list(vessel_id_to_branch_seg_map.values())
+    if vessel_ids.size and (vessel_ids.max() >= len(branch_seg_table) or np.any(branch_seg_table[vessel_ids, 0] < 0)):
+        message = "Error. There are wires connected to vessel blocks that are not in the 0d solver input file."
+        raise RuntimeError(message)
+    branch_ids, branch_segment_ids = branch_seg_table[vessel_ids].T
+
+    if np.any((wire_class_ids == _VAR_BC) & (branch_segment_ids != 0)):
+        message = 'Error. branch_segment_id should be 0 here because we are at the inlet wire of the branch.'
+        raise RuntimeError(message)
+    # keep 1) the wire connected downstream of each vessel block, 2) the inlet wire/node of the branch from an inlet BC, and 3) the junction wires at branch_segment_id 0, which are the inlet wire/node of a branch
+    # we ignore the internal wires where the vessel block is connected downstream of the wire (and the junction block is connected upstream of the wire)
+    keep = (wire_class_ids != _VAR_JUNCTION) | (branch_segment_ids == 0)
+    var_ids = wire_ids[keep]
+    branch_ids = branch_ids[keep]
+    branch_node_ids = branch_segment_ids[keep] + (wire_class_ids[keep] == _VAR_VESSEL)
+    wire_qoi_kinds = qoi_kinds[var_ids]
+
+    # group the wires by (branch_id, qoi); the sort is stable, so the wires of each group stay in the order of var_name_list
+    order = np.lexsort((wire_qoi_kinds, branch_ids))
+    var_ids, branch_ids, branch_node_ids, wire_qoi_kinds = var_ids[order], branch_ids[order], branch_node_ids[order], wire_qoi_kinds[order]
+    group_starts = np.flatnonzero(np.diff(branch_ids, prepend = -1) | np.diff(wire_qoi_kinds, prepend = -1))
+    group_ends = np.append(group_starts[1:], len(var_ids))
+
+    # write the results branch by branch, so that each branch's array is filled with a single scatter
+    for start, end in zip(group_starts.tolist(), group_ends.tolist()):
+        qoi = _QOIS[wire_qoi_kinds[start]]
+        zero_d_results[qoi][int(branch_ids[start])][branch_node_ids[start:end], :] = results_0d[:, var_ids[start:end]].T
 
     return zero_d_results
 
@@ -813,7 +998,8 @@ def extract_last_cardiac_cycle_simulation_results(time, results, number_of_time_
     """
     time_for_last_cardiac_cycle = time[-1*number_of_time_pts_per_cardiac_cycle:]
     time_for_last_cardiac_cycle = time_for_last_cardiac_cycle - time_for_last_cardiac_cycle[0] + time[0]
-    return time_for_last_cardiac_cycle, results[-1*number_of_time_pts_per_cardiac_cycle:, :]
+    # copy the last cardiac cycle (keeping the memory layout of results), so that the results for all cycles can be released
+    return time_for_last_cardiac_cycle, results[-1*number_of_time_pts_per_cardiac_cycle:, :].copy(order = "K")
 
 def run_last_cycle_extraction_routines(cardiac_cycle_period, number_of_time_pts_per_cardiac_cycle, zero_d_time, results_0d):
     """
@@ -860,6 +1046,18 @@ def save_directed_graph(block_list, connect_list, directed_graph_file_path):
     Returns:
         void, but saves a .png file visualizing the 0d model as a directed graph, as well as a networkx .dot file that can be opened with neato via graphviz to visualize the graph in a different layout
     """
+    # matplotlib and networkx are only needed here, so they are imported on first use instead of on every start-up of the solver
+    try:
+        import matplotlib.pyplot as plt
+    except ImportError:
+        message = "Error. matplotlib.pyplot not found. matplotlib.pyplot is needed to visualize your 0d model as a directed graph."
+        raise RuntimeError(message)
+    try:
+        import networkx as nx
+    except ImportError:
+        message = "Error. networkx not found. networkx is needed to visualize your 0d model as a directed graph."
+        raise RuntimeError(message)
+
     plt.figure(figsize=(20, 11))
     G = nx.DiGraph()
     G.add_edges_from([(block_list[tpl[0]].name, block_list[tpl[1]].name) for tpl in connect_list])
@@ -894,24 +1092,91 @@ def save_directed_graph(block_list, connect_list, directed_graph_file_path):
     # To extract coordinates and structure from the graphviz post-processor, use:
     # neato.exe test.dot -Gsplines=ortho -Gnodesep=1 -Goverlap=scale
 
-def save_simulation_results(zero_d_simulation_results_file_path, zero_d_results):
+def save_simulation_results(zero_d_simulation_results_file_path, zero_d_results, file_format = "npy"):
     """
     Purpose:
-        Save the 0d simulation results to a .npy file.
+        Save the 0d simulation results to a .npy or .npz file.
     Usage:
-        To open and load the .npy file to extract the 0d simulation results, use the following command:
+        To open and load the .npy or .npz file to extract the 0d simulation results, use load_simulation_results, or for .npy files, the following command:
             zero_d_results = np.load(/path/to/zero/d/simulation/results/npy/file, allow_pickle = True).item()
     Inputs:
         string zero_d_simulation_results_file_path
-            = path to the .npy file to which the 0d simulation results will be saved
+            = path to the .npy or .npz file to which the 0d simulation results will be saved
         dict zero_d_results
             = obtained from reformat_network_util_results_all or reformat_network_util_results_branch
+        string file_format
+            = "npy" to pickle zero_d_results as a dictionary into a .npy file
+            = "npz" to save each array of zero_d_results under the key "<qoi>/<var_name or branch_id>" (or "time") in a .npz file; this avoids pickling, so the file can be loaded without allow_pickle = True
+    Returns:
+        void, but saves a .npy or .npz file storing the 0d simulation results (zero_d_results)
+    """
+    if file_format == "npy":
+        np.save(zero_d_simulation_results_file_path, zero_d_results)
+    elif file_format == "npz":
+        flat_zero_d_results = {}
+        for qoi, results in zero_d_results.items():
+            if isinstance(results, np.ndarray):
+                flat_zero_d_results[qoi] = results
+            else:
+                for key, res in results.items():
+                    flat_zero_d_results[qoi + "/" + str(key)] = res
+        np.savez(zero_d_simulation_results_file_path, **flat_zero_d_results)
+    else:
+        message = "Error. Unknown file format, " + str(file_format) + ", for the 0d simulation results. The file format must be 'npy' or 'npz'."
+        raise RuntimeError(message)
+
+def load_simulation_results(zero_d_simulation_results_file_path):
+    """
+    Purpose:
+        Load the 0d simulation results saved by save_simulation_results, in either file format
+    Inputs:
+        string zero_d_simulation_results_file_path
+            = path to the .npy or .npz file storing the 0d simulation results; if the path has no extension, the .npz file is used if it exists and the .npy file otherwise
+    Returns:
+        dict zero_d_results
+            = the 0d simulation results, as returned by reformat_network_util_results_all or reformat_network_util_results_branch
+            -- in either file format, the per-branch results are dicts keyed by the (int) branch_id
+    """
+    file_path = zero_d_simulation_results_file_path
+    if not file_path.endswith((".npy", ".npz")):
+        file_path += ".npz" if os.path.exists(file_path + ".npz") else ".npy"
+    if file_path.endswith(".npy"):
+        return np.load(file_path, allow_pickle = True).item()
+    zero_d_results = {}
+    with np.load(file_path) as flat_zero_d_results:
+        for flat_key in flat_zero_d_results.files:
+            qoi, _, key = flat_key.partition("/")
+            if key:
+                zero_d_results.setdefault(qoi, {})[int(key) if key.isdigit() else key] = flat_zero_d_results[flat_key]
+            else:
+                zero_d_results[qoi] = flat_zero_d_results[flat_key]
+    return zero_d_results
+
+def load_solver_input_file(zero_d_solver_input_file_path):
+    """
+    Purpose:
+        Read the 0d solver input file, using orjson if it is installed and json otherwise
+    Inputs:
+        string zero_d_solver_input_file_path
+            = path to the 0d solver input file
     Returns:
-        void, but saves a .npy file storing the 0d simulation results (zero_d_results) as a dictionary.
+        dict parameters
+            = contents of the 0d solver input file
+    Caveats:
+        orjson rejects the NaN, Infinity, and -Infinity literals that json accepts, so files that orjson cannot parse are parsed again with json; the same input files load with or without orjson
     """
-    np.save(zero_d_simulation_results_file_path, zero_d_results)
+    if orjson is not None:
+        with open(zero_d_solver_input_file_path, 'rb') as infile:
+            contents = infile.read()
+        try:
+            return orjson.loads(contents)
+        except orjson.JSONDecodeError:
+            return json.loads(contents)
+    else:
+        with open(zero_d_solver_input_file_path, 'r') as infile:
+            return json.load(infile)
 
-def set_up_and_run_0d_simulation(zero_d_solver_input_file_path, draw_directed_graph = False, last_cycle = False, save_results_all = False, save_results_branch = True, use_custom_0d_elements = False, custom_0d_elements_arguments_file_path = None, use_ICs_from_npy_file = False, ICs_npy_file_path = None, save_y_ydot_to_npy = False, y_ydot_file_path = None, check_jacobian = False, simulation_start_time = 0.0, use_steady_soltns_as_ics = True):
+def set_up_and_run_0d_simulation(zero_d_solver_input_file_path, draw_directed_graph = False, last_cycle = False, save_results_all = False, save_results_branch = True, use_custom_0d_elements = False, custom_0d_elements_arguments_file_path = None, use_ICs_from_npy_file = False, ICs_npy_file_path = None, save_y_ydot_to_npy = False, y_ydot_file_path = None, check_jacobian = False, simulation_start_time = 0.0, use_steady_soltns_as_ics = True, results_file_format = "npy"):
     """
     Purpose:
         Create all network_util_NR::LPNBlock objects for the 0d model and run the 0d simulation.
@@ -946,6 +1211,8 @@ def set_up_and_run_0d_simulation(zero_d_solver_input_file_path, draw_directed_gr
             -- 0.0 <= simulation_start_time <= cardiac_cycle_period
         boolean use_steady_soltns_as_ics
             = True to 1) run the 0d simulation using steady mean BCs and zero initial conditions and then 2) use the steady-state solution from the previous part as the initial condition for the original pulsatile simulation
+        string results_file_format
+            = "npy" or "npz"; file format of the saved 0d simulation results (see save_simulation_results)
     Caveats:
         The save_results_branch option works only for 0d models with the branching structure where each vessel is modeled as a single branch with 1 or multiple sub-segments
     Returns:
@@ -956,24 +1223,34 @@ def set_up_and_run_0d_simulation(zero_d_solver_input_file_path, draw_directed_gr
     else:
         custom_0d_elements_arguments = None
 
-    with open(zero_d_solver_input_file_path, 'r') as infile:
-        parameters = json.load(infile)
+    parameters = load_solver_input_file(zero_d_solver_input_file_path)
 
     parameters["simulation_parameters"]["check_jacobian"] = check_jacobian
 
     if use_steady_soltns_as_ics:
-        parameters_mean = copy.deepcopy(parameters)
-        parameters_mean, altered_bc_blocks = use_steady_bcs.convert_unsteady_bcs_to_steady(parameters_mean)
-
-        # to run the 0d model with steady BCs to steady-state, simulate this model with large time step size for an arbitrarily small number of cardiac cycles
-        parameters_mean["simulation_parameters"]["number_of_time_pts_per_cardiac_cycle"] = 11
-        parameters_mean["simulation_parameters"]["number_of_cardiac_cycles"]             = 3
-
         y_ydot_file_path_temp = os.path.splitext(zero_d_solver_input_file_path)[0] + "_initial_conditions.npy"
 
-        create_LPN_blocks(parameters_mean, custom_0d_elements_arguments)
-        set_solver_parameters(parameters_mean)
-        zero_d_time, results_0d, var_name_list, y_f, ydot_f, var_name_list_original = run_network_util(
+        bcs_are_steady = use_steady_bcs.bcs_are_steady(parameters)
+        if bcs_are_steady:
+            # there is nothing to convert, so the steady simulation is the original 0d model with a different time stepping; both simulations share the same blocks
+            create_LPN_blocks(parameters, custom_0d_elements_arguments)
+            parameters_mean = {**parameters, "simulation_parameters" : dict(parameters["simulation_parameters"])}
+            altered_bc_blocks = []
+        else:
+            # only the simulation parameters and the converted boundary conditions are modified for the steady simulation, so copy just those instead of the entire model
+            boundary_conditions = list(parameters["boundary_conditions"])
+            for i in use_steady_bcs.get_indices_of_bcs_to_convert(parameters):
+                boundary_conditions[i] = dict(boundary_conditions[i], bc_values = dict(boundary_conditions[i]["bc_values"]))
+            parameters_mean = {**parameters,
+                               "simulation_parameters" : dict(parameters["simulation_parameters"]),
+                               "boundary_conditions" : boundary_conditions}
+            parameters_mean, altered_bc_blocks = use_steady_bcs.convert_unsteady_bcs_to_steady(parameters_mean)
+            create_LPN_blocks(parameters_mean, custom_0d_elements_arguments)
+
+        # to run the 0d model with steady BCs to steady-state, simulate this model with large time step size for an arbitrarily small number of cardiac cycles
+        _set_solver_parameters_fast(parameters_mean, 11, 3)
+        # only the final state of the steady simulation is needed, so its results are released right away
+        _, _, _, y_f, ydot_f, var_name_list_original = run_network_util(
                             zero_d_solver_input_file_path,
                             parameters_mean,
                             draw_directed_graph = False,
@@ -991,7 +1268,14 @@ def set_up_and_run_0d_simulation(zero_d_solver_input_file_path, draw_directed_gr
         use_ICs_from_npy_file = True
         ICs_npy_file_path = y_ydot_file_path_temp
 
-    create_LPN_blocks(parameters, custom_0d_elements_arguments)
+        if bcs_are_steady:
+            # the blocks are already connected; the time integration of the pulsatile simulation assembles all of their matrices and vectors again
+            parameters["network"] = parameters_mean["network"]
+        else:
+            # the junction and vessel blocks of the steady simulation are identical to those of the pulsatile simulation, so reuse them
+            create_LPN_blocks(parameters, custom_0d_elements_arguments, parameters_mean["junction_and_vessel_blocks"])
+    else:
+        create_LPN_blocks(parameters, custom_0d_elements_arguments)
     set_solver_parameters(parameters)
     zero_d_time, results_0d, var_name_list, _, _, _ = run_network_util(zero_d_solver_input_file_path, parameters, draw_directed_graph, use_ICs_from_npy_file, ICs_npy_file_path, save_y_ydot_to_npy, y_ydot_file_path, simulation_start_time)
     print("0D simulation completed!\n")
@@ -1001,14 +1285,37 @@ def set_up_and_run_0d_simulation(zero_d_solver_input_file_path, draw_directed_gr
         zero_d_time, results_0d = run_last_cycle_extraction_routines(parameters["simulation_parameters"]["cardiac_cycle_period"], parameters["simulation_parameters"]["number_of_time_pts_per_cardiac_cycle"], zero_d_time, results_0d)
     if save_results_all or save_results_branch:
         zero_d_input_file_name = os.path.splitext(zero_d_solver_input_file_path)[0]
+        parsed_var_names = parse_var_names(var_name_list) # shared by both reformatters
         if save_results_all:
             zero_d_simulation_results_file_path = zero_d_input_file_name + "_all_results"
-            zero_d_results = reformat_network_util_results_all(zero_d_time, results_0d, var_name_list)
-            save_simulation_results(zero_d_simulation_results_file_path, zero_d_results)
+            zero_d_results = reformat_network_util_results_all(zero_d_time, results_0d, var_name_list, parsed_var_names)
+            save_simulation_results(zero_d_simulation_results_file_path, zero_d_results, results_file_format)
+            del zero_d_results # release the reformatted results before the branch results are allocated
         if save_results_branch:
             zero_d_simulation_results_file_path = zero_d_input_file_name + "_branch_results"
-            zero_d_results = reformat_network_util_results_branch(zero_d_time, results_0d, var_name_list, parameters)
-            save_simulation_results(zero_d_simulation_results_file_path, zero_d_results)
+            vessel_index = build_vessel_index(parameters)
+            zero_d_results = reformat_network_util_results_branch(zero_d_time, results_0d, var_name_list, parameters, vessel_index, parsed_var_names)
+            save_simulation_results(zero_d_simulation_results_file_path, zero_d_results, results_file_format)
+
+def run_many(zero_d_solver_input_file_paths, max_workers = None, **kwargs):
+    """
+    Purpose:
+        Run several independent 0d simulations (e.g. a parameter sweep) in parallel, one simulation per worker process
+    Inputs:
+        list zero_d_solver_input_file_paths
+            = paths to the 0d solver input files
+        int max_workers
+            = maximum number of worker processes; defaults to the number of processors on the machine
+        **kwargs
+            = options passed to set_up_and_run_0d_simulation for every simulation (e.g. save_results_all = True)
+    Returns:
+        void, but each simulation saves its results next to its 0d solver input file, as with set_up_and_run_0d_simulation
+            -- raises the first exception raised by any of the simulations
+    """
+    run_simulation_for_path = functools.partial(set_up_and_run_0d_simulation, **kwargs)
+    with ProcessPoolExecutor(max_workers = max_workers) as executor:
+        for _ in executor.map(run_simulation_for_path, zero_d_solver_input_file_paths):
+            pass
 
 def run_from_c(*args, **kwargs):
     """Execute the 0D solver using passed parameters from c++.
@@ -1087,6 +1394,9 @@ def create_parser():
     parser.add_argument("-sic", "--useSteadyIC", action = 'store_true',
         help = "Run the pulsatile 0d simulation using the steady-state solution from the equivalent steady 0d model as the initial conditions.") # caveat - does not work with custom, user-defined BCs
 
+    parser.add_argument("-f", "--resultsFormat", default = "npy", choices = ["npy", "npz"],
+        help = "File format of the saved simulation results; npz files can be loaded without pickling")
+
     return parser
 
 def run_simulation(args):
@@ -1106,7 +1416,8 @@ def run_simulation(args):
                                     y_ydot_file_path = args.yydotPath,
                                     check_jacobian = args.checkJacobian,
                                     simulation_start_time = args.initialTime,
-                                    use_steady_soltns_as_ics = args.useSteadyIC
+                                    use_steady_soltns_as_ics = args.useSteadyIC,
+                                    results_file_format = args.resultsFormat
                                 )
 
 
@@ -1121,4 +1432,4 @@ def main():
     run_simulation(args)
 
 if __name__ == "__main__":
-    main(main)
+    main()
@@ -32,14 +32,11 @@
 
 import numpy as np
 import scipy
+import scipy.linalg
 import scipy.sparse.linalg
-from scipy.sparse import csr_matrix
-import copy
+from scipy.sparse import csc_matrix
 
-try:
-    import matplotlib.pyplot as plt
-except:
-    pass
+from .blocks import LPNBlock
 
 class GenAlpha:
     """
@@ -52,6 +49,7 @@ class GenAlpha:
         self.gamma = 0.5 + self.alpha_m - self.alpha_f
 
         self.fac = self.alpha_m / (self.alpha_f * self.gamma)
+        self.fac_ydot_guess = (self.gamma - 0.5) / self.gamma # initial guess of ydot at the next time step, relative to ydot
 
         # problem dimension
         self.n = y.shape[0]
@@ -59,55 +57,169 @@ class GenAlpha:
         # stores matrices E, F, vector C, and tangent matrices dE, dF, dC
         self.mat = {}
 
-        # jacobian matrix
-        self.M = np.zeros((self.n, self.n))
-        self.sparse = False
-        if self.n > 800:
-            self.solver = scipy.sparse.linalg.spsolve
-        else:
-            self.solver = np.linalg.solve
+        # jacobian matrix and its LU factorization (see solve_NR)
+        self.M = None
+        self.lu = None
+        self.M_factored = None
 
         # residual vector
         self.res = np.zeros(self.n)
 
+        # work vectors of step, allocated once: solution and time derivative at the generalized-alpha substep, and the Newton increment of ydotam
+        self.yaf = np.zeros(self.n)
+        self.ydotam = np.zeros(self.n)
+        self.dydotam = np.zeros(self.n)
+
+        # the matrices are sparse (csc_matrix) with the sparsity pattern of the 0d model, which is set up in set_block_list
         self.mats = ['E', 'F', 'dE', 'dF', 'dC']
         self.vecs = ['C']
-        for m in self.mats:
-            self.mat[m] = np.zeros((self.n, self.n))
         for v in self.vecs:
             self.mat[v] = np.zeros(self.n)
 
+        # blocks of the 0d model (see set_block_list)
+        self.block_list = None
+        self.time_dependent_blocks = []
+        self.solution_dependent_blocks = []
+
+    def set_block_list(self, block_list):
+        """
+        Set up the time integration for the blocks in block_list
+            1) sort out the time-dependent and solution-dependent blocks, i.e. the blocks that override LPNBlock.update_time and LPNBlock.update_solution; the other blocks do not need to be updated during the time integration
+            2) create the sparse matrices from the union of the blocks' global (row, column) ids, and map the entries of each block matrix to the entries of the sparse matrices
+            3) queue all block matrices and vectors for assembly; afterwards, the blocks only queue the matrices and vectors whose values change
+        -- the block list is fixed for the entire simulation, so this is done only once
+        """
+        if block_list is self.block_list:
+            return
+        self.block_list = block_list
+        for bl in block_list:
+            bl.queue_reassembly()
+        self.time_dependent_blocks = [b for b in block_list if type(b).update_time is not LPNBlock.update_time]
+        self.solution_dependent_blocks = [b for b in block_list if type(b).update_solution is not LPNBlock.update_solution]
+
+        # all block matrices of a block share the block's (row, column) ids, so all global matrices share one sparsity pattern
+        # -- the matrices are stored column by column (CSC), which is the format of SuperLU and makes [E | F] a matrix whose data is the data of E followed by the data of F
+        flat_ids = [np.asarray(bl.flat_col_ids, dtype=np.int64) * self.n + np.asarray(bl.flat_row_ids, dtype=np.int64) for bl in block_list]
+        pattern = np.unique(np.concatenate(flat_ids)) if flat_ids else np.zeros(0, dtype=np.int64)
+        self.indices = pattern % self.n
+        self.indptr = np.zeros(self.n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pattern // self.n, minlength=self.n), out=self.indptr[1:])
+        # position of each block matrix entry (in the order of bl.mat[m].ravel()) in the data of the sparse matrices
+        block_data_ids = [np.searchsorted(pattern, ids) for ids in flat_ids]
+        # the data of all matrices are the rows of a single contiguous array, in the order of self.mats (E, F, and then the tangent matrices dE, dF, dC)
+        self.mat_data = np.zeros((len(self.mats), len(pattern)))
+        for i, m in enumerate(self.mats):
+            self.mat[m] = csc_matrix((self.mat_data[i], self.indices, self.indptr), shape=(self.n, self.n))
+            self.mat[m].data = self.mat_data[i] # csc_matrix copies the data it is created with
+        # EF = [E | F], so that E * ydot + F * y = EF * [ydot, y] is a single sparse product; its data is a view of the data of E and F
+        self.EF = csc_matrix((self.mat_data[:2].reshape(-1), np.concatenate([self.indices, self.indices]), np.concatenate([self.indptr, self.indptr[1:] + len(pattern)])), shape=(self.n, 2 * self.n))
+        self.EF.data = self.mat_data[:2].reshape(-1)
+        self.ydot_y = np.zeros(2 * self.n)
+        # factorize the jacobian as a sparse matrix only if it is large and sparse; for small or fairly dense systems, dense LAPACK is faster than SuperLU
+        density = len(pattern) / self.n**2 if self.n else 1.0
+        self.sparse = self.n >= 100 and density < 0.1
+        self.lu = None
+        self.M_factored = None
+        self.M_invdt = None # invdt with which M was formed, or None if M must be formed again (see form_matrix_NR)
+        self.M_changed = False # True if M was formed again since the last solve (see solve_NR)
+
+        # the jacobian has the same sparsity pattern; its data is overwritten in form_matrix_NR
+        self.M = csc_matrix((np.zeros(len(pattern)), self.indices, self.indptr), shape=(self.n, self.n))
+        # E * fac * invdt, which only changes if E is assembled or the time step size changes (see form_matrix_NR)
+        self.M_tmp = np.zeros(len(pattern))
+        self.M_tmp_invdt = None
+
+        # for each matrix and vector, the blocks that contribute to it and the positions of all of their entries, concatenated in the order of the blocks
+        self.mat_assembly_map = {}
+        for m in self.mats:
+            ids = [data_ids for bl, data_ids in zip(block_list, block_data_ids) if m in bl.mat]
+            self.mat_assembly_map[m] = ([bl for bl in block_list if m in bl.mat], np.concatenate(ids) if ids else np.zeros(0, dtype=np.int64))
+        self.vec_assembly_map = {}
+        for v in self.vecs:
+            ids = [bl.global_row_id for bl in block_list if v in bl.vec]
+            self.vec_assembly_map[v] = ([bl for bl in block_list if v in bl.vec], np.concatenate(ids) if ids else np.zeros(0, dtype=np.int64))
 
     def assemble_structures(self, block_list):
         """
         Assemble block matrices into global matrices
+        -- a matrix or vector queued by any block is assembled from all blocks at once, with a single store into the global matrix or vector
         """
+        self.set_block_list(block_list)
+        mats_to_assemble = set()
+        vecs_to_assemble = set()
         for bl in block_list:
-            while bl.vecs_to_assemble:
-                n = bl.vecs_to_assemble.pop()
-                self.mat[n][bl.global_row_id] = bl.vec[n]
-            while bl.mats_to_assemble:
-                n = bl.mats_to_assemble.pop()
-                self.mat[n][bl.flat_row_ids, bl.flat_col_ids] = bl.mat[n].ravel()
+            if bl.mats_to_assemble:
+                mats_to_assemble.update(bl.mats_to_assemble)
+                bl.mats_to_assemble.clear()
+            if bl.vecs_to_assemble:
+                vecs_to_assemble.update(bl.vecs_to_assemble)
+                bl.vecs_to_assemble.clear()
+        for n in vecs_to_assemble:
+            blocks, ids = self.vec_assembly_map[n]
+            self.mat[n][ids] = np.concatenate([bl.vec[n] for bl in blocks])
+        for n in mats_to_assemble:
+            blocks, ids = self.mat_assembly_map[n]
+            self.mat[n].data[ids] = np.concatenate([bl.mat[n].ravel() for bl in blocks])
+        if mats_to_assemble:
+            self.M_invdt = None # M must be formed again
+        if "E" in mats_to_assemble:
+            self.M_tmp_invdt = None # E * fac * invdt must be computed again
 
     def form_matrix_NR(self, invdt):
         """
-        Create Jacobian matrix
+        Create Jacobian matrix, M = F + (dE + dF + dC + E * fac * invdt)
+        -- all matrices share the same sparsity pattern, so the sum is computed on their data, in place in the data of M
+        -- E * fac * invdt is kept from the previous call unless E was assembled or invdt changed since
+        -- M is kept as it is if no matrix was assembled and invdt did not change since the previous call
         """
-        self.M = (self.mat['F'] + (self.mat['dE'] + self.mat['dF'] + self.mat['dC'] + self.mat['E'] * self.fac * invdt))
+        if self.M_invdt == invdt:
+            return
+        self.M_invdt = invdt
+        self.M_changed = True
+        data = self.M.data
+        np.add.reduce(self.mat_data[2:], axis=0, out=data) # dE + dF + dC, in a single pass over the contiguous tangent matrix data
+        if self.M_tmp_invdt != invdt:
+            np.multiply(self.mat_data[0], self.fac, out=self.M_tmp)
+            self.M_tmp *= invdt
+            self.M_tmp_invdt = invdt
+        data += self.M_tmp
+        np.add(self.mat_data[1], data, out=data)
 
     def form_rhs_NR(self, y, ydot):
         """
-        Create residual vector
+        Create residual vector, res = - E * ydot - F * y - C = - [E | F] * [ydot, y] - C
         """
-        self.res = - self.mat['E'].dot(ydot) - self.mat['F'].dot(y) - self.mat['C']
+        self.ydot_y[:self.n] = ydot
+        self.ydot_y[self.n:] = y
+        res = self.EF.dot(self.ydot_y)
+        np.negative(res, out=res)
+        res -= self.mat['C']
+        self.res = res
+
+    def solve_NR(self):
+        """
+        Solve the Newton system M * dy = res
+        -- the LU factorization of M is reused until the values of M change, which for most 0d models (e.g. without stenoses) happens never after the first time step
+        -- M is factorized with SuperLU if self.sparse and with dense LAPACK otherwise (see set_block_list)
+        """
+        if self.lu is None or (self.M_changed and not np.array_equal(self.M.data, self.M_factored)):
+            if self.sparse:
+                self.lu = scipy.sparse.linalg.splu(self.M)
+            else:
+                self.lu = scipy.linalg.lu_factor(self.M.toarray(), overwrite_a=True, check_finite=False)
+            self.M_factored = self.M.data.copy()
+        self.M_changed = False
+        if self.sparse:
+            return self.lu.solve(self.res)
+        else:
+            return scipy.linalg.lu_solve(self.lu, self.res, check_finite=False)
 
     def form_matrix_NR_numerical(self, res_i, ydotam, args, block_list, epsilon):
         """
         Numerically compute the Jacobian by computing the partial derivatives of the residual using forward finite differences
         """
         # save original values for restoration later
-        yaf_original = copy.deepcopy(args['Solution']) # yaf_i
+        yaf_original = args['Solution'].copy() # yaf_i
 
         # compute numerical Jacobian
         J_numerical = np.zeros((self.n, self.n))
@@ -142,12 +254,14 @@ class GenAlpha:
         Check if the analytical Jacobian (computed from form_matrix_NR) matches the numerical Jacobian
         """
 
+        import matplotlib.pyplot as plt # only needed to check the jacobian, so imported on first use
+
         epsilon_list = np.power(10, np.linspace(-6, 4, 25))
 
         fig, axs = plt.subplots(self.n, self.n, figsize = (20, 20))
         for epsilon in epsilon_list:
             J_numerical = self.form_matrix_NR_numerical(res_i, ydotam, args, block_list, epsilon)
-            error = np.abs(self.M - J_numerical)
+            error = np.abs(self.M.toarray() - J_numerical)
             for ii in range(self.n):
                 for jj in range(self.n):
                     axs[ii, jj].loglog(epsilon, error[ii, jj], 'k*-')
@@ -162,59 +276,88 @@ class GenAlpha:
         """
         Perform one time step
         """
-        # initial guess for time step
-        curr_y = y.copy() + 0.5 * dt * ydot
-        curr_ydot = ydot.copy() * ((self.gamma - 0.5) / self.gamma)
-
-        # Substep level quantities
-        yaf = y + self.alpha_f * (curr_y - y)
-        ydotam = ydot + self.alpha_m * (curr_ydot - ydot)
+        # initial guess for time step, curr_y = y + 0.5 * dt * ydot and curr_ydot = ydot * (gamma - 0.5) / gamma,
+        # and substep level quantities, yaf = y + alpha_f * (curr_y - y) and ydotam = ydot + alpha_m * (curr_ydot - ydot)
+        # -- both are computed in place in the preallocated work vectors
+        yaf = self.yaf
+        np.multiply(ydot, 0.5 * dt, out=yaf)
+        # adding and then subtracting y is not a no-op: it rounds 0.5 * dt * ydot exactly as (curr_y - y) is rounded, so yaf stays bit-identical to y + alpha_f * (curr_y - y)
+        yaf += y
+        yaf -= y
+        yaf *= self.alpha_f
+        yaf += y
+        ydotam = self.ydotam
+        np.multiply(ydot, self.fac_ydot_guess, out=ydotam)
+        ydotam -= ydot
+        ydotam *= self.alpha_m
+        ydotam += ydot
 
         # initialize solution
+        # -- yaf is updated in place, so args['Solution'] stays bound to it during the Newton iterations
         args['Time'] = t + self.alpha_f * dt
         args['Solution'] = yaf
 
+        self.set_block_list(block_list)
+
         # initialize blocks
-        for b in block_list:
+        for b in self.time_dependent_blocks:
             b.update_time(args)
 
         iit = 0
         invdt = 1.0 / dt
         fac_ydotam = self.fac * invdt
-        while (np.abs(self.res).max() > 5e-4 or iit == 0) and iit < nit:
+        tol = 5e-4
+        # bind the per-iteration callables once, outside of the Newton loop
+        solution_dependent_blocks = self.solution_dependent_blocks
+        assemble_structures = self.assemble_structures
+        form_rhs_NR = self.form_rhs_NR
+        form_matrix_NR = self.form_matrix_NR
+        solve_NR = self.solve_NR
+        # the finite-difference check of the jacobian is done only after the first time step
+        check_jacobian = args['check_jacobian'] and args['Time'] > dt
+        while iit < nit:
             # update solution-dependent blocks
-            for b in block_list:
+            for b in solution_dependent_blocks:
                 b.update_solution(args)
 
             # update residual and jacobian
-            self.assemble_structures(block_list)
-            self.form_rhs_NR(yaf, ydotam)
-            self.form_matrix_NR(invdt)
+            assemble_structures(block_list)
+            form_rhs_NR(yaf, ydotam)
+            form_matrix_NR(invdt)
 
             # perform finite-difference check of jacobian if requested
-            if args['check_jacobian']:
-                if args['Time'] > dt:
-                    self.check_jacobian(copy.deepcopy(self.res), ydotam, args, block_list)
+            if check_jacobian:
+                self.check_jacobian(self.res.copy(), ydotam, args, block_list)
+                args['Solution'] = yaf # the check leaves a copy of yaf in args
 
             # solve for Newton increment
-            dy = self.solver(self.M, self.res)
+            dy = solve_NR()
 
             # update solution
             yaf += dy
-            ydotam += dy * fac_ydotam
+            np.multiply(dy, fac_ydotam, out=self.dydotam)
+            ydotam += self.dydotam
 
-            if np.isnan(self.res).any():
+            # the largest absolute entry of the residual is nan if any entry is nan, so it serves both the nan check and the convergence check
+            res_max = np.abs(self.res).max()
+            if np.isnan(res_max):
                 raise RuntimeError('Solution nan')
 
-            args['Solution'] = yaf
             iit += 1
+            if res_max <= tol:
+                break
 
         if iit >= nit:
             print("Max NR iterations reached at time: ", t, " , max error: ", max(abs(self.res)))
 
         # update time step
-        curr_y = y + (yaf - y) / self.alpha_f
-        curr_ydot = ydot + (ydotam - ydot) / self.alpha_m
+        # -- curr_y and curr_ydot are new arrays, since the caller keeps them (e.g. as the input of the next time step)
+        curr_y = np.subtract(yaf, y)
+        curr_y /= self.alpha_f
+        curr_y += y
+        curr_ydot = np.subtract(ydotam, ydot)
+        curr_ydot /= self.alpha_m
+        curr_ydot += ydot
 
         args['Time'] = t + dt
 
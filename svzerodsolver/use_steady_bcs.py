@@ -28,7 +28,6 @@
 # NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-import copy
 import numpy as np
 
 class altered_bc_block: # data structure to help restore the internal variables in the RCR and coronary BCs
@@ -47,8 +46,20 @@ def compute_time_averaged_bc_value_for_single_cardiac_cycle(time, bc_values, car
         np.array bc_values
             = defined over a single cardiac cycle (bc_values[0] == bc_values[-1])
         float cardiac_cycle_period
+    Caveats:
+        BC waveforms are usually short lists, so for fewer than 64 time points the trapezoidal rule is summed directly instead of converting them to np.arrays; longer waveforms are integrated with numpy (np.trapezoid, or an equivalent np.diff-based sum on numpy 1.x, where np.trapezoid does not exist)
     """
-    time_averaged_value = (1.0 / cardiac_cycle_period) * np.trapz(bc_values, time)
+    if len(time) < 64:
+        integral = sum((t1 - t0) * (v0 + v1) for t0, t1, v0, v1 in zip(time, time[1:], bc_values, bc_values[1:])) / 2.0
+    else:
+        time = np.asarray(time, dtype = float)
+        bc_values = np.asarray(bc_values, dtype = float)
+        trapezoid = getattr(np, "trapezoid", None)
+        if trapezoid is not None:
+            integral = trapezoid(bc_values, time)
+        else:
+            integral = np.sum(np.diff(time) * (bc_values[1:] + bc_values[:-1])) / 2.0
+    time_averaged_value = (1.0 / cardiac_cycle_period) * integral
     return time_averaged_value
 
 def get_bc_name_to_index_map(parameters):
@@ -59,15 +70,16 @@ def get_bc_name_to_index_map(parameters):
     return bc_name_to_index_map
 
 def create_vessel_id_to_boundary_condition_map(parameters):
+    # look up the BCs by name instead of scanning all BCs for every vessel; like the scan, the last BC with a given name is used
+    bc_name_to_boundary_condition_map = {boundary_condition["bc_name"] : boundary_condition for boundary_condition in parameters["boundary_conditions"]}
     vessel_id_to_boundary_condition_map = {}
     for vessel in parameters["vessels"]:
         if "boundary_conditions" in vessel:
             vessel_id = vessel["vessel_id"]
             vessel_id_to_boundary_condition_map[vessel_id] = {}
             for location, bc_name in vessel["boundary_conditions"].items():
-                for boundary_condition in parameters["boundary_conditions"]:
-                    if boundary_condition["bc_name"] == bc_name:
-                        vessel_id_to_boundary_condition_map[vessel_id][location] = boundary_condition
+                if bc_name in bc_name_to_boundary_condition_map:
+                    vessel_id_to_boundary_condition_map[vessel_id][location] = bc_name_to_boundary_condition_map[bc_name]
     parameters["vessel_id_to_boundary_condition_map"] = vessel_id_to_boundary_condition_map
 
 def get_ids_of_cap_vessels(parameters, location): # location == "inlet" or "outlet"
@@ -78,6 +90,27 @@ def get_ids_of_cap_vessels(parameters, location): # location == "inlet" or "outl
                 ids_of_cap_vessels.append(vessel["vessel_id"])
     return ids_of_cap_vessels
 
+def bcs_are_steady(parameters):
+    """
+    Check if all BCs are already steady, i.e. resistance BCs and flow/pressure BCs with constant values. Capacitance-based (RCR and coronary) and custom BCs are never considered steady.
+    """
+    bc_identifiers = {"FLOW" : "Q", "PRESSURE" : "P"}
+    for boundary_condition in parameters["boundary_conditions"]:
+        bc_type = boundary_condition["bc_type"]
+        if bc_type in bc_identifiers:
+            if np.ptp(boundary_condition["bc_values"][bc_identifiers[bc_type]]) != 0:
+                return False
+        elif bc_type != "RESISTANCE":
+            return False
+    return True
+
+def get_indices_of_bcs_to_convert(parameters):
+    """
+    Return the indices (in parameters["boundary_conditions"]) of the BCs that convert_unsteady_bcs_to_steady() modifies; these are the only BCs that must be copied before the conversion.
+    """
+    converted_bc_types = ["FLOW", "PRESSURE", "CORONARY", "RCR"]
+    return [i for i, boundary_condition in enumerate(parameters["boundary_conditions"]) if boundary_condition["bc_type"] in converted_bc_types]
+
 def convert_unsteady_bcs_to_steady(parameters):
     """
     Convert unsteady BCs into equivalent steady BC by
@@ -141,9 +174,9 @@ def restore_internal_variables_for_capacitance_based_bcs(y_f, ydot_f, var_name_l
     """
     Restore the internal variables (and set them to their steady state values) for the boundary condition blocks with capacitors (RCR and coronary).
     """
-    y0 = copy.deepcopy(y_f)
-    ydot0 = copy.deepcopy(ydot_f)
-    var_name_list = copy.deepcopy(var_name_list_f)
+    y0 = y_f.copy()
+    ydot0 = ydot_f.copy()
+    var_name_list = list(var_name_list_f)
     for block in altered_bc_blocks:
         if block.bc_type in ["RCR", "CORONARY"]:
             if block.location == "outlet":
@@ -1,13 +1,34 @@
-from svzerodsolver.solver import set_up_and_run_0d_simulation
+from svzerodsolver.solver import set_up_and_run_0d_simulation, run_many, load_simulation_results
+from svzerodsolver.solver import build_vessel_index, get_vessel_id_to_length_map, get_vessel_id_to_vessel_name_map
+from svzerodsolver.solver import reformat_network_util_results_all, create_unsteady_bc_value_function, load_in_ics
+from svzerodsolver.solver import load_solver_input_file
+from svzerodsolver.time_integration import GenAlpha
 import os
 
 import shutil
 import numpy as np
+import pytest
+import scipy.interpolate
 
 RTOL_PRES = 1.0e-7
 RTOL_FLOW = 1.0e-8
 
 
+def copy_test_case(name, testdir):
+    """Copy the input file of a test case to a directory.
+
+    Args:
+        name: Name of the test case.
+        testdir: Directory for performing the simulation.
+
+    Returns:
+        Path of the copied input file.
+    """
+    testfile = os.path.join(os.path.dirname(__file__), "cases", name + ".json")
+    input_file = os.path.join(testdir, name + ".json")
+    shutil.copyfile(testfile, input_file)
+    return input_file
+
 def run_test_case_by_name(name, testdir):
     """Run a test case by its case name.
     
@@ -15,9 +36,7 @@ def run_test_case_by_name(name, testdir):
         name: Name of the test case.
         testdir: Directory for performing the simulation.
     """
-    testfile = os.path.join(os.path.dirname(__file__), "cases", name + ".json")
-    shutil.copyfile(testfile, os.path.join(testdir, name + ".json"))
-    set_up_and_run_0d_simulation(os.path.join(testdir, name + ".json"))
+    set_up_and_run_0d_simulation(copy_test_case(name, testdir))
     result_file = os.path.join(testdir, name + "_branch_results.npy")
     return np.load(result_file, allow_pickle=True).item()
 
@@ -27,8 +46,8 @@ def get_result(result_array, field, branch, branch_node, time_step):
     return result_array[field][branch][branch_node, time_step]
 
 
-def test_steady_flow_R_R(tmpdir):
-    results = run_test_case_by_name("steadyFlow_R_R", tmpdir)
+def test_steady_flow_R_R(tmp_path):
+    results = run_test_case_by_name("steadyFlow_R_R", tmp_path)
     assert np.isclose(
         get_result(results, "pressure", 0, 0, -1), 1100.0, rtol=RTOL_PRES
     )  # inlet pressure
@@ -43,8 +62,8 @@ def test_steady_flow_R_R(tmpdir):
     )  # outlet flow
 
 
-def test_steady_flow_r_coronary(tmpdir):
-    results = run_test_case_by_name("steadyFlow_R_coronary", tmpdir)
+def test_steady_flow_r_coronary(tmp_path):
+    results = run_test_case_by_name("steadyFlow_R_coronary", tmp_path)
     assert np.isclose(
         get_result(results, "pressure", 0, 0, -1), 2000.0, rtol=RTOL_PRES
     )  # inlet pressure
@@ -59,8 +78,8 @@ def test_steady_flow_r_coronary(tmpdir):
     )  # outlet flow
 
 
-def test_steady_flow_rlc_r(tmpdir):
-    results = run_test_case_by_name("steadyFlow_RLC_R", tmpdir)
+def test_steady_flow_rlc_r(tmp_path):
+    results = run_test_case_by_name("steadyFlow_RLC_R", tmp_path)
     assert np.isclose(
         get_result(results, "pressure", 0, 0, -1), 1100.0, rtol=RTOL_PRES
     )  # inlet pressure
@@ -75,8 +94,8 @@ def test_steady_flow_rlc_r(tmpdir):
     )  # outlet flow
 
 
-def test_steady_flow_rc_r(tmpdir):
-    results = run_test_case_by_name("steadyFlow_RC_R", tmpdir)
+def test_steady_flow_rc_r(tmp_path):
+    results = run_test_case_by_name("steadyFlow_RC_R", tmp_path)
     assert np.isclose(
         get_result(results, "pressure", 0, 0, -1), 1100.0, rtol=RTOL_PRES
     )  # inlet pressure
@@ -91,8 +110,8 @@ def test_steady_flow_rc_r(tmpdir):
     )  # outlet flow
 
 
-def test_steady_flow_rl_r(tmpdir):
-    results = run_test_case_by_name("steadyFlow_RL_R", tmpdir)
+def test_steady_flow_rl_r(tmp_path):
+    results = run_test_case_by_name("steadyFlow_RL_R", tmp_path)
     assert np.isclose(
         get_result(results, "pressure", 0, 0, -1), 1100.0, rtol=RTOL_PRES
     )  # inlet pressure
@@ -107,8 +126,8 @@ def test_steady_flow_rl_r(tmpdir):
     )  # outlet flow
 
 
-def test_steady_flow_r_rcr(tmpdir):
-    results = run_test_case_by_name("steadyFlow_R_RCR", tmpdir)
+def test_steady_flow_r_rcr(tmp_path):
+    results = run_test_case_by_name("steadyFlow_R_RCR", tmp_path)
     assert np.isclose(
         get_result(results, "pressure", 0, 0, -1), 10500.0, rtol=RTOL_PRES
     )  # inlet pressure
@@ -123,8 +142,8 @@ def test_steady_flow_r_rcr(tmpdir):
     )  # outlet flow
 
 
-def test_steady_flow_r_steady_pressure(tmpdir):
-    results = run_test_case_by_name("steadyFlow_R_steadyPressure", tmpdir)
+def test_steady_flow_r_steady_pressure(tmp_path):
+    results = run_test_case_by_name("steadyFlow_R_steadyPressure", tmp_path)
     assert np.isclose(
         get_result(results, "pressure", 0, 0, -1), 1500.0, rtol=RTOL_PRES
     )  # inlet pressure
@@ -139,8 +158,8 @@ def test_steady_flow_r_steady_pressure(tmpdir):
     )  # outlet flow
 
 
-def test_steady_flow_stenosis_r(tmpdir):
-    results = run_test_case_by_name("steadyFlow_stenosis_R", tmpdir)
+def test_steady_flow_stenosis_r(tmp_path):
+    results = run_test_case_by_name("steadyFlow_stenosis_R", tmp_path)
     assert np.isclose(
         get_result(results, "pressure", 0, 0, -1), 3600.0, rtol=RTOL_PRES
     )  # inlet pressure
@@ -155,8 +174,8 @@ def test_steady_flow_stenosis_r(tmpdir):
     )  # outlet flow
 
 
-def test_steady_flow_bifurcationr_r1(tmpdir):
-    results = run_test_case_by_name("steadyFlow_bifurcationR_R1", tmpdir)
+def test_steady_flow_bifurcationr_r1(tmp_path):
+    results = run_test_case_by_name("steadyFlow_bifurcationR_R1", tmp_path)
     assert np.isclose(
         get_result(results, "pressure", 0, 0, -1), 1100.0, rtol=RTOL_PRES
     )  # parent inlet pressure
@@ -195,8 +214,8 @@ def test_steady_flow_bifurcationr_r1(tmpdir):
     )  # daughter2 outlet flow
 
 
-def test_steady_flow_bifurcationr_r2(tmpdir):
-    results = run_test_case_by_name("steadyFlow_bifurcationR_R2", tmpdir)
+def test_steady_flow_bifurcationr_r2(tmp_path):
+    results = run_test_case_by_name("steadyFlow_bifurcationR_R2", tmp_path)
     assert np.isclose(
         get_result(results, "pressure", 0, 0, -1), 3462.5, rtol=RTOL_PRES
     )  # parent inlet pressure
@@ -235,8 +254,8 @@ def test_steady_flow_bifurcationr_r2(tmpdir):
     )  # daughter2 outlet flow
 
 
-def test_pulsatile_flow_r_rcr(tmpdir):
-    results = run_test_case_by_name("pulsatileFlow_R_RCR", tmpdir)
+def test_pulsatile_flow_r_rcr(tmp_path):
+    results = run_test_case_by_name("pulsatileFlow_R_RCR", tmp_path)
     assert np.isclose(
         get_result(results, "pressure", 0, 0, 0), 4620.0, rtol=RTOL_PRES
     )  # inlet pressure
@@ -251,8 +270,8 @@ def test_pulsatile_flow_r_rcr(tmpdir):
     )  # outlet flow
 
 
-def test_pulsatile_flow_r_coronary(tmpdir):
-    results = run_test_case_by_name("pulsatileFlow_R_coronary", tmpdir)
+def test_pulsatile_flow_r_coronary(tmp_path):
+    results = run_test_case_by_name("pulsatileFlow_R_coronary", tmp_path)
     assert np.isclose(
         get_result(results, "pressure", 0, 0, 0), 880.0, rtol=RTOL_PRES
     )  # inlet pressure
@@ -267,8 +286,8 @@ def test_pulsatile_flow_r_coronary(tmpdir):
     )  # outlet flow
 
 
-def test_pusatile_flow_cstenosis_steady_pressure(tmpdir):
-    results = run_test_case_by_name("pusatileFlow_CStenosis_steadyPressure", tmpdir)
+def test_pusatile_flow_cstenosis_steady_pressure(tmp_path):
+    results = run_test_case_by_name("pusatileFlow_CStenosis_steadyPressure", tmp_path)
     assert np.isclose(
         get_result(results, "pressure", 0, 0, -439),
         0.5937169800360568,
@@ -289,8 +308,8 @@ def test_pusatile_flow_cstenosis_steady_pressure(tmpdir):
     )  # outlet flow
 
 
-def test_steady_flow_confluencer_r(tmpdir):
-    results = run_test_case_by_name("steadyFlow_confluenceR_R", tmpdir)
+def test_steady_flow_confluencer_r(tmp_path):
+    results = run_test_case_by_name("steadyFlow_confluenceR_R", tmp_path)
     assert np.isclose(
         get_result(results, "pressure", 0, 0, -1), 6600.0, rtol=RTOL_PRES
     )  # parent inlet pressure
@@ -327,3 +346,159 @@ def test_steady_flow_confluencer_r(tmpdir):
     assert np.isclose(
         get_result(results, "flow", 2, -1, -1), 15.0, rtol=RTOL_FLOW
     )  # daughter2 outlet flow
+
+
+def test_run_many(tmp_path):
+    names = ["steadyFlow_R_R", "steadyFlow_R_steadyPressure"]
+    run_many([copy_test_case(name, tmp_path) for name in names], max_workers=2)
+    results = [
+        np.load(os.path.join(tmp_path, name + "_branch_results.npy"), allow_pickle=True).item()
+        for name in names
+    ]
+    assert np.isclose(
+        get_result(results[0], "pressure", 0, 0, -1), 1100.0, rtol=RTOL_PRES
+    )  # inlet pressure of steadyFlow_R_R
+    assert np.isclose(
+        get_result(results[1], "pressure", 0, 0, -1), 1500.0, rtol=RTOL_PRES
+    )  # inlet pressure of steadyFlow_R_steadyPressure
+
+
+def test_steady_flow_R_R_npz(tmp_path):
+    name = "steadyFlow_R_R"
+    input_file = copy_test_case(name, tmp_path)
+    set_up_and_run_0d_simulation(input_file, results_file_format="npz")
+    results = load_simulation_results(os.path.join(tmp_path, name + "_branch_results"))
+    assert os.path.exists(os.path.join(tmp_path, name + "_branch_results.npz"))
+    assert np.isclose(
+        get_result(results, "pressure", 0, 0, -1), 1100.0, rtol=RTOL_PRES
+    )  # inlet pressure
+    assert np.isclose(
+        get_result(results, "flow", 0, -1, -1), 5.0, rtol=RTOL_FLOW
+    )  # outlet flow
+    results_npy = run_test_case_by_name(name, tmp_path)
+    for qoi in ["flow", "pressure", "distance"]:
+        assert isinstance(results[qoi], dict)
+        assert isinstance(results_npy[qoi], dict)
+        assert results[qoi].keys() == results_npy[qoi].keys()
+
+
+def test_steady_flow_R_R_all_results(tmp_path):
+    name = "steadyFlow_R_R"
+    input_file = copy_test_case(name, tmp_path)
+    set_up_and_run_0d_simulation(input_file, save_results_all=True)
+    results = np.load(os.path.join(tmp_path, name + "_all_results.npy"), allow_pickle=True).item()
+    assert set(results["flow"]) == {"Q_BC0_inlet_V0", "Q_V0_BC0_outlet"}
+    assert set(results["pressure"]) == {"P_BC0_inlet_V0", "P_V0_BC0_outlet"}
+    assert set(results["internal"]) == {"var_0_V0"}
+    for qoi in ["flow", "pressure", "internal"]:
+        for res in results[qoi].values():
+            assert res.shape == results["time"].shape
+    assert np.isclose(results["pressure"]["P_BC0_inlet_V0"][-1], 1100.0, rtol=RTOL_PRES)  # inlet pressure
+    assert np.isclose(results["pressure"]["P_V0_BC0_outlet"][-1], 600.0, rtol=RTOL_PRES)  # outlet pressure
+    assert np.isclose(results["flow"]["Q_V0_BC0_outlet"][-1], 5.0, rtol=RTOL_FLOW)  # outlet flow
+
+
+def test_all_results_unknown_var_name():
+    zero_d_time = np.array([0.0, 1.0])
+    results_0d = np.zeros((2, 2), order="F")
+    with pytest.raises(RuntimeError, match="unknown_V0"):
+        reformat_network_util_results_all(zero_d_time, results_0d, ["Q_BC0_inlet_V0", "unknown_V0"])
+
+
+def test_unsteady_bc_value_function_matches_cubic_spline():
+    time = [0.0, 0.1, 0.25, 0.4, 0.6, 0.8, 1.0]
+    bc_values = [5.0, 8.0, 12.0, 9.0, 6.0, 4.0, 5.0]
+    function = create_unsteady_bc_value_function(time, bc_values)
+    spline = scipy.interpolate.CubicSpline(np.array(time), np.array(bc_values), bc_type="periodic")
+    for t in np.concatenate([np.linspace(-1.5, 2.5, 81), time]):  # includes t < 0 and t > period
+        assert np.isclose(function(t), spline(t), rtol=1e-12, atol=1e-12)
+    assert create_unsteady_bc_value_function([0.0, 1.0], [3.0, 3.0])(0.7) == 3.0
+
+
+def test_ics_round_trip(tmp_path):
+    name = "steadyFlow_R_RCR"
+    input_file = copy_test_case(name, tmp_path)
+    ics_file = os.path.join(tmp_path, "ics.npy")
+    set_up_and_run_0d_simulation(input_file, save_y_ydot_to_npy=True, y_ydot_file_path=ics_file)
+    ics = np.load(ics_file, allow_pickle=True).item()
+    var_name_list = list(ics["var_name_list"])
+
+    # saved order
+    y, ydot = load_in_ics(var_name_list, ics)
+    assert np.array_equal(y, ics["y"])
+    assert np.array_equal(ydot, ics["ydot"])
+
+    # permuted order
+    perm = np.random.default_rng(0).permutation(len(var_name_list))
+    ics_permuted = {
+        "y": ics["y"][perm],
+        "ydot": ics["ydot"][perm],
+        "var_name_list": [var_name_list[i] for i in perm],
+    }
+    y, ydot = load_in_ics(var_name_list, ics_permuted)
+    assert np.array_equal(y, ics["y"])
+    assert np.array_equal(ydot, ics["ydot"])
+
+    # restarting from either file gives the same results
+    results = []
+    for ics_file_name, ics_dict in [("ics_saved.npy", ics), ("ics_permuted.npy", ics_permuted)]:
+        np.save(os.path.join(tmp_path, ics_file_name), ics_dict)
+        set_up_and_run_0d_simulation(input_file, use_ICs_from_npy_file=True, ICs_npy_file_path=os.path.join(tmp_path, ics_file_name), use_steady_soltns_as_ics=False)
+        results.append(np.load(os.path.join(tmp_path, name + "_branch_results.npy"), allow_pickle=True).item())
+    for qoi in ["flow", "pressure"]:
+        for branch_id in results[0][qoi]:
+            assert np.array_equal(results[0][qoi][branch_id], results[1][qoi][branch_id])
+
+
+@pytest.mark.parametrize("name", ["steadyFlow_R_RCR", "pulsatileFlow_R_RCR", "pulsatileFlow_R_coronary"])
+def test_reused_blocks_match_fresh_blocks(tmp_path, name):
+    # the pulsatile simulation reuses the blocks of the steady simulation that computes its initial conditions;
+    # restarting from the same initial conditions with newly created blocks must give the same results
+    reused = run_test_case_by_name(name, tmp_path)
+    ics_file = os.path.join(tmp_path, name + "_initial_conditions.npy")
+    set_up_and_run_0d_simulation(os.path.join(tmp_path, name + ".json"), use_ICs_from_npy_file=True, ICs_npy_file_path=ics_file, use_steady_soltns_as_ics=False)
+    fresh = np.load(os.path.join(tmp_path, name + "_branch_results.npy"), allow_pickle=True).item()
+    for qoi in ["flow", "pressure"]:
+        for branch_id in fresh[qoi]:
+            assert np.array_equal(reused[qoi][branch_id], fresh[qoi][branch_id])
+
+
+@pytest.mark.parametrize("name", ["pulsatileFlow_R_coronary", "pusatileFlow_CStenosis_steadyPressure", "steadyFlow_bifurcationR_R1"])
+def test_sparse_solver_matches_dense_solver(tmp_path, monkeypatch, name):
+    # the test cases are too small for set_block_list to choose SuperLU, so force it after the block list is set up
+    os.makedirs(os.path.join(tmp_path, "dense"))
+    dense = run_test_case_by_name(name, os.path.join(tmp_path, "dense"))
+    set_block_list = GenAlpha.set_block_list
+    forced_sparse = []
+
+    def set_block_list_sparse(self, block_list):
+        set_block_list(self, block_list)
+        self.sparse = True
+        forced_sparse.append(self.n)
+
+    monkeypatch.setattr(GenAlpha, "set_block_list", set_block_list_sparse)
+    os.makedirs(os.path.join(tmp_path, "sparse"))
+    sparse = run_test_case_by_name(name, os.path.join(tmp_path, "sparse"))
+    assert forced_sparse
+    for qoi in ["flow", "pressure"]:
+        for branch_id in dense[qoi]:
+            assert np.allclose(sparse[qoi][branch_id], dense[qoi][branch_id], rtol=1e-10, atol=1e-10)
+
+
+def test_load_solver_input_file_non_finite_literals(tmp_path):
+    input_file = os.path.join(tmp_path, "input.json")
+    with open(input_file, "w") as ff:
+        ff.write('{"a": NaN, "b": Infinity, "c": -Infinity, "d": 1.5}')
+    parameters = load_solver_input_file(input_file)
+    assert np.isnan(parameters["a"])
+    assert parameters["b"] == np.inf
+    assert parameters["c"] == -np.inf
+    assert parameters["d"] == 1.5
+
+
+def test_vessel_maps_without_branch_names():
+    parameters = {"vessels": [{"vessel_id": 0, "vessel_name": "V0", "vessel_length": 1.0}]}
+    assert get_vessel_id_to_length_map(parameters) == {0: 1.0}
+    assert get_vessel_id_to_vessel_name_map(parameters) == {0: "V0"}
+    with pytest.raises(ValueError, match="V0"):
+        build_vessel_index(parameters)